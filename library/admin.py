@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import User, Student, Book, Transaction, TransactionItem, VerificationCode
+from .models import User, Student, Book, Transaction, TransactionItem, VerificationCode, KioskOperation, OutboxMessage
+from .outbox import requeue_dead
 
 
 class TransactionItemInline(admin.TabularInline):
@@ -43,7 +44,7 @@ class TransactionAdmin(admin.ModelAdmin):
     inlines = [TransactionItemInline]
     
     def get_book_count(self, obj):
-        return obj.items.count()
+        return obj.item_count
     get_book_count.short_description = 'Books'
 
 
@@ -55,8 +56,28 @@ class TransactionItemAdmin(admin.ModelAdmin):
     date_hierarchy = 'borrowed_date'
 
 
+@admin.register(KioskOperation)
+class KioskOperationAdmin(admin.ModelAdmin):
+    list_display = ['idempotency_key', 'operation', 'student_id', 'status', 'created_by', 'created_at']
+    list_filter = ['operation', 'status', 'created_at']
+    search_fields = ['idempotency_key', 'student_id']
+
+
 @admin.register(VerificationCode)
 class VerificationCodeAdmin(admin.ModelAdmin):
     list_display = ['student', 'code', 'created_at', 'expires_at', 'is_used']
     list_filter = ['is_used', 'created_at']
     search_fields = ['student__student_id', 'code']
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'to', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['subject', 'to']
+    readonly_fields = ['attempts', 'last_error', 'created_at', 'sent_at']
+    actions = ['requeue']
+
+    @admin.action(description='Requeue selected dead-lettered messages')
+    def requeue(self, request, queryset):
+        self.message_user(request, f'Requeued {requeue_dead(queryset)} message(s).')
@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import DailyBookStat, DailyCategoryStat, DailyCohortStat, RollupWatermark
+from .rollups import WATERMARK_NAME
+
+
+PERIODS = ('day', 'week', 'month')
+DEFAULT_RANGE_DAYS = 30
+TOP_BOOKS = 10
+
+
+def _totals(queryset, *fields):
+    return queryset.values(*fields).annotate(loans=Sum('loans'), returns=Sum('returns'))
+
+
+def circulation_report(start, end, period='week'):
+    """
+    Loans/returns between `start` and `end` (dates, inclusive) built only from
+    the daily rollup tables, so the cost depends on the date range rather
+    than on how much circulation history exists.
+    """
+    period = period if period in PERIODS else 'week'
+    in_range = {'day__gte': start, 'day__lte': end}
+    categories = DailyCategoryStat.objects.filter(**in_range)
+    period_of = Trunc('day', period)
+
+    timeline = list(_totals(categories.annotate(period=period_of), 'period').order_by('period'))
+    periods = [row['period'] for row in timeline]
+
+    # Category x period grid of loan counts
+    grid = {}
+    for row in _totals(categories.annotate(period=period_of), 'category', 'period'):
+        grid.setdefault(row['category'], {})[row['period']] = row['loans']
+    by_category = [
+        {**row, 'cells': [grid.get(row['category'], {}).get(p, 0) for p in periods]}
+        for row in _totals(categories, 'category').order_by('-loans', 'category')
+    ]
+
+    watermark = RollupWatermark.objects.filter(name=WATERMARK_NAME).values_list('processed_until', flat=True).first()
+
+    return {
+        'start': start,
+        'end': end,
+        'period': period,
+        'periods': periods,
+        'timeline': timeline,
+        'by_category': by_category,
+        'by_cohort': _totals(DailyCohortStat.objects.filter(**in_range), 'course', 'year').order_by('course', 'year'),
+        'top_books': _totals(
+            DailyBookStat.objects.filter(**in_range), 'book_id', 'book__title', 'book__author'
+        ).order_by('-loans', 'book__title')[:TOP_BOOKS],
+        'processed_until': watermark,
+    }
+
+
+def default_range():
+    end = timezone.localdate()
+    return end - timedelta(days=DEFAULT_RANGE_DAYS - 1), end
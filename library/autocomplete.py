@@ -0,0 +1,198 @@
+import bisect
+import itertools
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Book
+from .text import fold, words
+
+
+DEFAULT_MAX_ENTRIES = 500000
+DEFAULT_MAX_AGE = 300
+MIN_TOKEN_LENGTH = 2
+# Caps the scan for one-letter prefixes that match a large part of the catalog
+MAX_CANDIDATES = 400
+
+logger = logging.getLogger(__name__)
+
+
+def tokenize(text):
+    return [token for token in words(text) if len(token) >= MIN_TOKEN_LENGTH]
+
+
+class PrefixIndex:
+    """
+    Sorted array of (token, book_id) pairs over title and author words.
+
+    A prefix lookup is one bisect plus a short bounded scan, so it stays
+    well under a millisecond at catalog scale. LIBRARY_AUTOCOMPLETE_MAX_ENTRIES caps the
+    number of pairs kept (title words are indexed before author words, so
+    the budget trims author words first). Edits in this process are applied
+    immediately. To pick up edits made by other processes, the index is rebuilt
+    after LIBRARY_AUTOCOMPLETE_MAX_AGE seconds. The rebuild runs on one
+    background thread while requests keep using the stale index. Only the
+    very first build makes its caller (and anyone arriving meanwhile) wait.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held by whichever thread is (re)building, so only one ever runs
+        self._build_lock = threading.Lock()
+        self._entries = []
+        self._books = {}
+        self._built_at = None
+        # Edits made while a rebuild reads the table, replayed onto its result
+        self._edits = None
+
+    @property
+    def max_entries(self):
+        return getattr(settings, 'LIBRARY_AUTOCOMPLETE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+
+    @property
+    def max_age(self):
+        return getattr(settings, 'LIBRARY_AUTOCOMPLETE_MAX_AGE', DEFAULT_MAX_AGE)
+
+    def _pairs(self, book_id, title, author):
+        title_tokens = dict.fromkeys(tokenize(title))
+        author_tokens = [t for t in dict.fromkeys(tokenize(author)) if t not in title_tokens]
+        return [(token, book_id) for token in title_tokens], [(token, book_id) for token in author_tokens]
+
+    def rebuild(self):
+        with self._build_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        # Callers hold _build_lock
+        with self._lock:
+            self._edits = []
+        try:
+            books = {}
+            title_pairs, author_pairs = [], []
+            for book_id, title, author in Book.objects.values_list('id', 'title', 'author').iterator():
+                books[book_id] = (title, author)
+                titles, authors = self._pairs(book_id, title, author)
+                title_pairs += titles
+                author_pairs += authors
+
+            entries = (title_pairs + author_pairs)[:self.max_entries]
+            entries.sort()
+        except BaseException:
+            with self._lock:
+                self._edits = None
+            raise
+
+        with self._lock:
+            self._entries = entries
+            self._books = books
+            for book_id, fields in self._edits:
+                self._remove_locked(book_id)
+                if fields is not None:
+                    self._add_locked(book_id, *fields)
+            self._edits = None
+            self._built_at = time.monotonic()
+
+    def _refresh_in_background(self):
+        try:
+            self._rebuild()
+        except Exception:
+            # The stale index stays up; the next lookup tries again
+            logger.exception('Autocomplete index rebuild failed')
+        finally:
+            self._build_lock.release()
+            connection.close()
+
+    def _ensure_fresh(self):
+        if self._built_at is None:
+            with self._build_lock:
+                if self._built_at is None:
+                    self._rebuild()
+        elif time.monotonic() - self._built_at > self.max_age and self._build_lock.acquire(blocking=False):
+            try:
+                threading.Thread(target=self._refresh_in_background, name='autocomplete-rebuild', daemon=True).start()
+            except BaseException:
+                self._build_lock.release()
+                raise
+
+    def _remove_locked(self, book_id):
+        previous = self._books.pop(book_id, None)
+        if previous is None:
+            return
+        titles, authors = self._pairs(book_id, *previous)
+        for pair in titles + authors:
+            position = bisect.bisect_left(self._entries, pair)
+            if position < len(self._entries) and self._entries[position] == pair:
+                del self._entries[position]
+
+    def _add_locked(self, book_id, title, author):
+        self._books[book_id] = (title, author)
+        titles, authors = self._pairs(book_id, title, author)
+        for pair in titles + authors:
+            if len(self._entries) >= self.max_entries:
+                break
+            bisect.insort(self._entries, pair)
+
+    def update_book(self, book_id, title, author):
+        with self._lock:
+            if self._edits is not None:
+                self._edits.append((book_id, (title, author)))
+            if self._built_at is not None:
+                self._remove_locked(book_id)
+                self._add_locked(book_id, title, author)
+
+    def remove_book(self, book_id):
+        with self._lock:
+            if self._edits is not None:
+                self._edits.append((book_id, None))
+            if self._built_at is not None:
+                self._remove_locked(book_id)
+
+    def suggest(self, query, limit=8):
+        """Top `limit` books whose title/author words start with every word of `query`."""
+        tokens = words(query)
+        if not tokens:
+            return []
+        self._ensure_fresh()
+
+        # Candidates come from the last (possibly partial) word; the earlier
+        # words must also prefix-match a word of the same book.
+        *complete, partial = tokens
+        with self._lock:
+            start = bisect.bisect_left(self._entries, (partial,))
+            candidates = []
+            seen = set()
+            for token, book_id in itertools.islice(self._entries, start, None):
+                if not token.startswith(partial):
+                    break
+                if book_id not in seen:
+                    seen.add(book_id)
+                    candidates.append(book_id)
+                    if len(candidates) >= MAX_CANDIDATES:
+                        break
+            books = {book_id: self._books[book_id] for book_id in candidates}
+
+        phrase = fold(query).strip()
+        scored = []
+        for book_id, (title, author) in books.items():
+            book_words = tokenize(f'{title} {author}')
+            if not all(any(word.startswith(t) for word in book_words) for t in complete):
+                continue
+            normalized_title = fold(title)
+            score = (not normalized_title.startswith(phrase), len(title), normalized_title)
+            scored.append((score, book_id, title, author))
+
+        scored.sort()
+        return [
+            {'id': book_id, 'title': title, 'author': author}
+            for _, book_id, title, author in scored[:limit]
+        ]
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'books': len(self._books), 'max_entries': self.max_entries}
+
+
+book_index = PrefixIndex()
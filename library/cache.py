@@ -0,0 +1,107 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .isbn import canonicalize_isbn
+from .models import Book
+from .versions import get_version, bump
+
+
+BOOK_RECORD_FIELDS = ('id', 'title', 'author', 'isbn', 'copies_available')
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def _cache():
+    return caches[getattr(settings, 'LIBRARY_BOOK_CACHE_ALIAS', 'default')]
+
+
+def _key(canonical_isbn):
+    return f'book:isbn:{canonical_isbn}'
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def get_book_record(raw_isbn):
+    """
+    Return a compact dict for the book with this ISBN, or None.
+
+    Records are cached by canonical ISBN in the cache named by
+    LIBRARY_BOOK_CACHE_ALIAS; eviction and expiry are whatever that
+    backend is configured with (MAX_ENTRIES / TIMEOUT for locmem).
+    """
+    canonical = canonicalize_isbn(raw_isbn)
+    if not canonical:
+        return None
+
+    cache = _cache()
+    record = cache.get(_key(canonical))
+    if record is not None:
+        _count('hits')
+        return record
+
+    _count('misses')
+    record = Book.objects.filter(canonical_isbn=canonical).values(*BOOK_RECORD_FIELDS).first()
+    if record is not None:
+        cache.set(_key(canonical), record)
+    return record
+
+
+async def aget_book_record(raw_isbn):
+    """Async twin of get_book_record() for the ASGI kiosk endpoints."""
+    canonical = canonicalize_isbn(raw_isbn)
+    if not canonical:
+        return None
+
+    cache = _cache()
+    record = await cache.aget(_key(canonical))
+    if record is not None:
+        _count('hits')
+        return record
+
+    _count('misses')
+    record = await Book.objects.filter(canonical_isbn=canonical).values(*BOOK_RECORD_FIELDS).afirst()
+    if record is not None:
+        await cache.aset(_key(canonical), record)
+    return record
+
+
+def invalidate_isbns(canonical_isbns):
+    keys = [_key(isbn) for isbn in canonical_isbns if isbn]
+    if keys:
+        _cache().delete_many(keys)
+        _count('invalidations', len(keys))
+
+
+def invalidate_books(book_ids):
+    isbns = Book.objects.filter(id__in=book_ids).values_list('canonical_isbn', flat=True)
+    invalidate_isbns(list(isbns))
+    bump_catalog_version()
+
+
+def catalog_version():
+    """Number that changes whenever any book (or its stock) changes."""
+    return get_version('books')
+
+
+def bump_catalog_version():
+    bump('books')
+
+
+def cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    return stats
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
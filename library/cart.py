@@ -0,0 +1,148 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .models import Book, PosCartRecord
+
+
+logger = logging.getLogger(__name__)
+
+CART_FIELDS = ('id', 'title', 'isbn', 'author')
+
+
+class CacheCartStore:
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, ids, timeout):
+        self.cache.set(key, ids, timeout)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+
+class DatabaseCartStore:
+    """One PosCartRecord row per kiosk session; shared by every worker."""
+
+    def get(self, key):
+        return PosCartRecord.objects.filter(
+            session_key=key, expires_at__gt=timezone.now()
+        ).values_list('book_ids', flat=True).first()
+
+    def set(self, key, ids, timeout):
+        PosCartRecord.objects.bulk_create(
+            [PosCartRecord(session_key=key, book_ids=ids, expires_at=timezone.now() + timedelta(seconds=timeout))],
+            update_conflicts=True,
+            unique_fields=['session_key'],
+            update_fields=['book_ids', 'expires_at']
+        )
+
+    def delete(self, key):
+        # Checkout is a good moment to drop carts abandoned by other kiosks
+        PosCartRecord.objects.filter(session_key=key).delete()
+        PosCartRecord.objects.filter(expires_at__lte=timezone.now()).delete()
+
+
+class FallbackCartStore:
+    """The configured cache, falling back to the database while the cache is unreachable."""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+
+    def _call(self, method, *args):
+        try:
+            return getattr(self.primary, method)(*args)
+        except Exception:
+            logger.exception('POS cart cache unavailable; using the database store')
+            return getattr(self.fallback, method)(*args)
+
+    def get(self, key):
+        return self._call('get', key)
+
+    def set(self, key, ids, timeout):
+        self._call('set', key, ids, timeout)
+
+    def delete(self, key):
+        self._call('delete', key)
+
+
+def get_cart_store():
+    """LIBRARY_POS_CART_STORE: 'cache' (default, with DB fallback) or 'database'."""
+    if getattr(settings, 'LIBRARY_POS_CART_STORE', 'cache') == 'database':
+        return DatabaseCartStore()
+    return FallbackCartStore(
+        CacheCartStore(getattr(settings, 'LIBRARY_POS_CART_CACHE_ALIAS', 'default')),
+        DatabaseCartStore()
+    )
+
+
+class PosCart:
+    """
+    The books a kiosk is about to lend, kept outside the session table.
+
+    Only the ordered book ids are stored, under the kiosk's session key, in
+    the store chosen by LIBRARY_POS_CART_STORE: the cache named by
+    LIBRARY_POS_CART_CACHE_ALIAS, or the PosCartRecord table when carts must
+    be shared by workers without a shared cache. Titles and authors are read
+    fresh when the cart is displayed.
+    """
+
+    def __init__(self, request):
+        if request.session.session_key is None:
+            request.session.save()
+        self.key = f'pos:cart:{request.session.session_key}'
+        self.store = get_cart_store()
+        self.timeout = getattr(settings, 'LIBRARY_POS_CART_TIMEOUT', 2 * 60 * 60)
+        self._ids = None
+
+    def ids(self):
+        if self._ids is None:
+            self._ids = list(self.store.get(self.key) or [])
+            self._id_set = set(self._ids)
+        return self._ids
+
+    def __contains__(self, book_id):
+        self.ids()
+        return book_id in self._id_set
+
+    def __len__(self):
+        return len(self.ids())
+
+    def add_many(self, book_ids):
+        added = [book_id for book_id in dict.fromkeys(book_ids) if book_id not in self]
+        if added:
+            self._ids = self.ids() + added
+            self._id_set.update(added)
+            self._save()
+        return added
+
+    def add(self, book_id):
+        return bool(self.add_many([book_id]))
+
+    def remove(self, book_ids):
+        book_ids = set(book_ids)
+        self._ids = [book_id for book_id in self.ids() if book_id not in book_ids]
+        self._id_set.difference_update(book_ids)
+        self._save()
+
+    def clear(self):
+        self.store.delete(self.key)
+        self._ids = []
+        self._id_set = set()
+
+    def books(self):
+        ids = self.ids()
+        if not ids:
+            return []
+        found = {book['id']: book for book in Book.objects.filter(id__in=ids).values(*CART_FIELDS)}
+        return [found[book_id] for book_id in ids if book_id in found]
+
+    def _save(self):
+        self.store.set(self.key, self._ids, self.timeout)
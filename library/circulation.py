@@ -0,0 +1,127 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, When, Value, F, Count, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .counters import adjust
+from .inventory import InsufficientCopies, return_copies
+from .loan_summary import refresh_loan_summary
+from .versions import bump_on_commit
+from .models import Book, Transaction, TransactionItem
+
+
+LOAN_PERIOD_DAYS = 7
+
+
+class ItemsAlreadyReturned(Exception):
+    pass
+
+
+def create_loan(student, book_ids, created_by):
+    """
+    Create a pending borrowing Transaction with one item per book.
+
+    The books are fetched in one query and the items written with a single
+    bulk_create, so the query count does not depend on the cart size.
+    Raises InsufficientCopies (and writes nothing) if a book has been
+    deleted or has no copy available.
+    """
+    book_ids = list(dict.fromkeys(int(book_id) for book_id in book_ids))
+
+    with transaction.atomic():
+        books = Book.objects.only('id', 'title', 'copies_available').in_bulk(book_ids)
+        unavailable = [
+            books[book_id] for book_id in book_ids
+            if book_id in books and books[book_id].copies_available <= 0
+        ]
+        missing_ids = [book_id for book_id in book_ids if book_id not in books]
+        if unavailable or missing_ids:
+            raise InsufficientCopies(unavailable, missing_ids)
+
+        loan = Transaction.objects.create(
+            student=student,
+            transaction_code=Transaction.generate_transaction_code(),
+            due_date=timezone.now() + timedelta(days=LOAN_PERIOD_DAYS),
+            created_by=created_by,
+            item_count=len(book_ids),
+            open_item_count=len(book_ids)
+        )
+        TransactionItem.objects.bulk_create([
+            TransactionItem(transaction=loan, book_id=book_id, borrowed_date=loan.borrowed_date)
+            for book_id in book_ids
+        ])
+
+    return loan
+
+
+def return_items(student, item_ids, returned_at=None):
+    """
+    Return the student's borrowed items in a fixed number of statements.
+
+    Items are flipped with one UPDATE ... WHERE id IN, stock is put back with
+    grouped F() updates, open_item_count is decremented for all affected
+    transactions in one UPDATE and every Transaction left without open items
+    is closed by another. Raises ItemsAlreadyReturned (nothing changed)
+    if another kiosk returned one of the items in the meantime.
+    """
+    returned_at = returned_at or timezone.now()
+
+    with transaction.atomic():
+        items = list(
+            TransactionItem.objects.select_for_update().filter(
+                id__in=item_ids,
+                transaction__student=student,
+                transaction__approval_status='approved',
+                status='borrowed'
+            ).select_related('book', 'transaction')
+        )
+        if not items:
+            return []
+
+        updated = TransactionItem.objects.filter(
+            id__in=[item.id for item in items],
+            status='borrowed'
+        ).update(status='returned', return_date=returned_at)
+        if updated != len(items):
+            raise ItemsAlreadyReturned()
+
+        restocked = return_copies(item.book_id for item in items)
+
+        returned_per_loan = Counter(item.transaction_id for item in items)
+        Transaction.objects.filter(id__in=returned_per_loan).update(
+            open_item_count=F('open_item_count') - Case(
+                *[When(id=loan_id, then=Value(count)) for loan_id, count in returned_per_loan.items()],
+                output_field=IntegerField()
+            )
+        )
+        closed = Transaction.objects.filter(
+            id__in=returned_per_loan,
+            status='borrowed',
+            open_item_count=0
+        ).update(status='returned', return_date=returned_at, reminder_stage='', next_reminder_at=None)
+
+        adjust(available_books=restocked, borrowed_loans=-closed)
+        refresh_loan_summary(student.id)
+        bump_on_commit('transactions', f'student:{student.id}')
+
+    for item in items:
+        item.status = 'returned'
+        item.return_date = returned_at
+    return items
+
+
+def refresh_item_counts(transaction_ids):
+    """Recompute item_count/open_item_count from the items, for edits made outside the paths above."""
+    def count(**filters):
+        return Coalesce(Subquery(
+            TransactionItem.objects.filter(transaction=OuterRef('pk'), **filters)
+            .order_by().values('transaction').annotate(n=Count('id')).values('n')
+        ), 0)
+
+    Transaction.objects.filter(id__in=transaction_ids).update(
+        item_count=count(),
+        open_item_count=count(status='borrowed')
+    )
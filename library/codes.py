@@ -0,0 +1,148 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.apps import apps
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+
+NODE_MODULUS = 10000
+SEQUENCE_MODULUS = 1000
+# A process renews its node id once less than half of this is left; ids
+# of processes that died are reused after it runs out
+NODE_LEASE = timedelta(hours=6)
+
+
+class NodeLeaseError(RuntimeError):
+    pass
+
+
+class NodeLease:
+    """
+    A node id claimed for this process in TransactionNodeLease.
+
+    The claim is written in the caller's transaction, next to the codes it
+    is used for, and re-checked on every call until that transaction
+    commits: a code can only be saved while its node id is held by this
+    process. A forked worker starts over with an owner of its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self.owner = None
+        self.node_id = None
+        self.expires_at = None
+        self.confirmed = False
+
+    def current(self, now=None):
+        now = now or timezone.now()
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self.owner = f'{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:12]}'[-100:]
+                self.node_id = None
+            held = self.node_id is not None and self.confirmed and now < self.expires_at - NODE_LEASE / 2
+            if held:
+                return self.node_id
+            node_id = self.node_id
+        # Queries run outside the lock: threads racing here claim for the same owner
+        return self._claim(node_id, now)
+
+    def _claim(self, node_id, now):
+        model = apps.get_model('library', 'TransactionNodeLease')
+        expires_at = now + NODE_LEASE
+        ours = {'owner': self.owner, 'expires_at': expires_at}
+
+        # Keep (or renew) the id we have unless it lapsed and was taken
+        if node_id is not None and model.objects.filter(node_id=node_id, owner=self.owner).update(**ours):
+            return self._held(node_id, expires_at)
+
+        # Reuse an id whose owner stopped renewing it
+        for candidate in model.objects.filter(expires_at__lte=now).values_list('node_id', flat=True)[:10]:
+            if model.objects.filter(node_id=candidate, expires_at__lte=now).update(**ours):
+                return self._held(candidate, expires_at)
+
+        for _ in range(10):
+            top = model.objects.aggregate(top=Max('node_id'))['top']
+            candidate = 0 if top is None else top + 1
+            if candidate >= NODE_MODULUS:
+                break
+            try:
+                with transaction.atomic():
+                    model.objects.create(node_id=candidate, **ours)
+            except IntegrityError:
+                continue  # Another process took it first
+            return self._held(candidate, expires_at)
+        raise NodeLeaseError('No transaction node id is free; every id has a live lease')
+
+    def _held(self, node_id, expires_at):
+        with self._lock:
+            self.node_id, self.expires_at = node_id, expires_at
+            self.confirmed = not connection.in_atomic_block
+
+        if not self.confirmed:
+            def confirm():
+                with self._lock:
+                    if self.node_id == node_id and self.expires_at == expires_at:
+                        self.confirmed = True
+            transaction.on_commit(confirm)
+        return node_id
+
+
+class TransactionCodeGenerator:
+    """
+    Time-ordered transaction codes: school code, UTC time to the
+    millisecond, a 4-digit node id and a 3-digit per-millisecond sequence,
+    e.g. ISU20251103142001123 0042 007 (without the spaces).
+
+    Codes from one node never repeat: the clock is never allowed to run
+    backwards and a node waits for the next millisecond after 1000 codes.
+    Unless a node_id is given, each process leases one of its own from the
+    database (see NodeLease), so codes are unique across processes too.
+    """
+
+    def __init__(self, node_id=None):
+        self._node_id = node_id
+        self._lease = NodeLease()
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._sequence = 0
+
+    @property
+    def node_id(self):
+        if self._node_id is not None:
+            return self._node_id
+        return self._lease.current()
+
+    def _next_tick(self):
+        with self._lock:
+            now_ms = max(time.time_ns() // 1_000_000, self._last_ms)
+            if now_ms == self._last_ms:
+                self._sequence += 1
+                if self._sequence >= SEQUENCE_MODULUS:
+                    while now_ms <= self._last_ms:
+                        time.sleep(0.0001)
+                        now_ms = time.time_ns() // 1_000_000
+                    self._sequence = 0
+            else:
+                self._sequence = 0
+            self._last_ms = now_ms
+            return now_ms, self._sequence
+
+    def generate(self, school_code='ISU'):
+        node_id = self.node_id
+        now_ms, sequence = self._next_tick()
+        stamp = datetime.fromtimestamp(now_ms / 1000, tz=dt_timezone.utc)
+        return (
+            f"{school_code}{stamp.strftime('%Y%m%d%H%M%S')}{now_ms % 1000:03d}"
+            f"{node_id:04d}{sequence:03d}"
+        )
+
+
+transaction_codes = TransactionCodeGenerator()
@@ -0,0 +1,113 @@
+from django.db import transaction
+from django.db.models import Case, When, F, Value, BigIntegerField
+
+from .models import Student, Book, Transaction, LibraryCounter
+from .versions import bump_on_commit
+
+
+# Counter name -> queryset it mirrors; used for self-healing and reconciliation
+COUNTER_QUERIES = {
+    'students': lambda: Student.objects.all(),
+    'pending_registrations': lambda: Student.objects.filter(user__isnull=False, is_approved=False),
+    'books': lambda: Book.objects.all(),
+    'available_books': lambda: Book.objects.filter(copies_available__gt=0),
+    'borrowed_loans': lambda: Transaction.objects.filter(status='borrowed', approval_status='approved'),
+    'pending_loans': lambda: Transaction.objects.filter(approval_status='pending'),
+}
+
+# Fields whose values decide which counters a row contributes to
+COUNTED_FIELDS = {
+    Student: ('user', 'is_approved'),
+    Book: ('copies_available',),
+    Transaction: ('status', 'approval_status'),
+}
+
+
+def _contribution(model, values):
+    if model is Student:
+        return {
+            'students': 1,
+            'pending_registrations': int(values['user'] is not None and not values['is_approved']),
+        }
+    if model is Book:
+        return {'books': 1, 'available_books': int(values['copies_available'] > 0)}
+    return {
+        'borrowed_loans': int(values['status'] == 'borrowed' and values['approval_status'] == 'approved'),
+        'pending_loans': int(values['approval_status'] == 'pending'),
+    }
+
+
+def _attnames(model):
+    return {name: model._meta.get_field(name).attname for name in COUNTED_FIELDS[model]}
+
+
+def contribution(instance):
+    """Counter values this (in-memory) row accounts for."""
+    model = type(instance)
+    return _contribution(model, {name: getattr(instance, attname) for name, attname in _attnames(model).items()})
+
+
+def stored_contribution(instance):
+    """Counter values the row accounts for as currently stored, or None if it is new."""
+    if instance._state.adding or instance.pk is None:
+        return None
+    model = type(instance)
+    attnames = _attnames(model)
+    row = model.objects.filter(pk=instance.pk).values(*attnames.values()).first()
+    if row is None:
+        return None
+    return _contribution(model, {name: row[attname] for name, attname in attnames.items()})
+
+
+def difference(new, old):
+    return {name: new.get(name, 0) - (old or {}).get(name, 0) for name in new}
+
+
+def adjust(**deltas):
+    """
+    Apply counter deltas in one UPDATE, inside the caller's transaction so
+    the counters commit or roll back with the change they describe.
+    """
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        updated = LibraryCounter.objects.filter(name__in=deltas).update(
+            value=F('value') + Case(
+                *[When(name=name, then=Value(delta)) for name, delta in deltas.items()],
+                output_field=BigIntegerField()
+            )
+        )
+        if updated != len(deltas):
+            # A counter that was never seeded is recounted; the recount
+            # already includes this change
+            for name in deltas:
+                LibraryCounter.objects.get_or_create(name=name, defaults={'value': COUNTER_QUERIES[name]().count()})
+
+
+def read_counters():
+    """All dashboard counters in a single primary-key read."""
+    values = dict(LibraryCounter.objects.filter(name__in=COUNTER_QUERIES).values_list('name', 'value'))
+    missing = [name for name in COUNTER_QUERIES if name not in values]
+    if missing:
+        values.update(rebuild_counters(missing))
+    return values
+
+
+def rebuild_counters(names=None):
+    """
+    Recount `names` (all counters by default) from the source tables and
+    store the results. The counter rows are locked first, so a concurrent
+    change either lands in the recount or applies its delta after it.
+    """
+    names = list(names or COUNTER_QUERIES)
+    values = {}
+    with transaction.atomic():
+        list(LibraryCounter.objects.select_for_update().filter(name__in=names))
+        for name in names:
+            values[name] = COUNTER_QUERIES[name]().count()
+            LibraryCounter.objects.update_or_create(name=name, defaults={'value': values[name]})
+        # Panels caching counter values follow this, not the entity versions
+        bump_on_commit('counters')
+    return values
@@ -0,0 +1,82 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Case, When, Value, BooleanField, Count, F, IntegerField, ExpressionWrapper
+from django.db.models.functions import Floor
+
+from .cache import catalog_version
+from .models import Book
+from .search import search_books
+from .text import fold
+
+
+AVAILABILITY_CHOICES = (
+    ('available', 'Available'),
+    ('unavailable', 'Checked out'),
+)
+
+
+def _key(search_query):
+    digest = hashlib.md5(' '.join(fold(search_query).split()).encode()).hexdigest()
+    return f'book:facets:{catalog_version()}:{digest}'
+
+
+def compute_facets(queryset):
+    """Category, availability and decade counts for `queryset` in one GROUP BY."""
+    rows = queryset.order_by().values(
+        'category',
+        available=Case(When(copies_available__gt=0, then=Value(True)), default=Value(False), output_field=BooleanField()),
+        decade=ExpressionWrapper(Floor(F('year_published') / 10.0) * 10, output_field=IntegerField())
+    ).annotate(count=Count('id'))
+
+    categories, availability, decades = {}, {'available': 0, 'unavailable': 0}, {}
+    total = 0
+    for row in rows:
+        count = row['count']
+        total += count
+        categories[row['category']] = categories.get(row['category'], 0) + count
+        availability['available' if row['available'] else 'unavailable'] += count
+        if row['decade'] is not None:
+            decades[int(row['decade'])] = decades.get(int(row['decade']), 0) + count
+
+    return {
+        'total': total,
+        'categories': [{'value': name, 'count': count} for name, count in sorted(categories.items())],
+        'availability': [
+            {'value': value, 'label': label, 'count': availability[value]}
+            for value, label in AVAILABILITY_CHOICES
+        ],
+        'decades': [
+            {'value': decade, 'label': f'{decade}s', 'count': count}
+            for decade, count in sorted(decades.items(), reverse=True)
+        ],
+    }
+
+
+def book_facets(search_query=''):
+    """
+    Facet counts for the books matching `search_query` (the whole catalog
+    when empty), cached until the catalog version changes.
+    """
+    cache = caches[getattr(settings, 'LIBRARY_BOOK_CACHE_ALIAS', 'default')]
+    key = _key(search_query)
+    facets = cache.get(key)
+    if facets is None:
+        queryset = search_books(search_query, ranked=False) if search_query.strip() else Book.objects.all()
+        facets = compute_facets(queryset)
+        cache.set(key, facets)
+    return facets
+
+
+def filter_by_facets(queryset, category='', availability='', decade=''):
+    if category:
+        queryset = queryset.filter(category=category)
+    if availability == 'available':
+        queryset = queryset.filter(copies_available__gt=0)
+    elif availability == 'unavailable':
+        queryset = queryset.filter(copies_available__lte=0)
+    if decade.isdigit():
+        start = int(decade)
+        queryset = queryset.filter(year_published__gte=start, year_published__lt=start + 10)
+    return queryset
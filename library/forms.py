@@ -118,6 +118,10 @@ class BookForm(forms.ModelForm):
             'copies_total': forms.NumberInput(attrs={'class': 'w-full px-4 py-3 border border-gray-300 rounded-lg'}),
             'description': forms.Textarea(attrs={'class': 'w-full px-4 py-3 border border-gray-300 rounded-lg', 'rows': 4}),
         }
+    
+    def clean_isbn(self):
+        # Check digit and duplicate checks live on Book, so the admin gets them too
+        return self.cleaned_data['isbn'].strip()
 
 
 class POSUserForm(forms.ModelForm):
@@ -0,0 +1,66 @@
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .versions import get_versions
+
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def _cache():
+    return caches[getattr(settings, 'LIBRARY_FRAGMENT_CACHE_ALIAS', 'default')]
+
+
+def _count(name, outcome):
+    with _stats_lock:
+        counts = _stats.setdefault(name, {'hits': 0, 'misses': 0})
+        counts[outcome] += 1
+
+
+def cached_fragment(name, depends_on, template_name, build_context, vary_on=()):
+    """
+    Render `template_name` with `build_context()` once per combination of
+    the versions of the `depends_on` entities (plus any `vary_on` values),
+    and serve it from the fragment cache after that.
+
+    Entries never expire: a write bumps an entity's version, so its
+    fragments are simply no longer looked up and age out of the cache.
+    `build_context` is only called on a miss, so the panel's queries are
+    skipped entirely on a hit. Fragments are rendered without the request,
+    so they must not contain per-user or CSRF content.
+    """
+    versions = get_versions(*depends_on)
+    key = ':'.join(['fragment', name] + [f'{entity}={versions[entity]}' for entity in depends_on])
+    if vary_on:
+        key += ':' + hashlib.md5(repr(tuple(vary_on)).encode()).hexdigest()
+
+    cache = _cache()
+    html = cache.get(key)
+    if html is not None:
+        _count(name, 'hits')
+        return mark_safe(html)
+
+    _count(name, 'misses')
+    html = render_to_string(template_name, build_context())
+    cache.set(key, html, timeout=None)
+    return mark_safe(html)
+
+
+def fragment_stats():
+    with _stats_lock:
+        stats = {name: dict(counts) for name, counts in _stats.items()}
+    for counts in stats.values():
+        lookups = counts['hits'] + counts['misses']
+        counts['hit_rate'] = round(counts['hits'] / lookups, 4) if lookups else 0.0
+    return stats
+
+
+def reset_fragment_stats():
+    with _stats_lock:
+        _stats.clear()
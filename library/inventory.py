@@ -0,0 +1,119 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import invalidate_books
+from .counters import adjust
+from .loan_summary import refresh_loan_summary
+from .reminders import first_reminder
+from .versions import bump_on_commit
+from .models import Book, Transaction
+
+
+class LoanAlreadyProcessed(Exception):
+    pass
+
+
+class _Shortage(Exception):
+    pass
+
+
+class InsufficientCopies(Exception):
+    def __init__(self, books, missing_ids=()):
+        self.books = books
+        self.missing_ids = list(missing_ids)
+        super().__init__(', '.join(book.title for book in books))
+
+
+def _group_by_quantity(counts):
+    groups = defaultdict(list)
+    for book_id, quantity in counts.items():
+        groups[quantity].append(book_id)
+    return groups.items()
+
+
+def _invalidate_on_commit(book_ids):
+    book_ids = list(book_ids)
+    transaction.on_commit(lambda: invalidate_books(book_ids))
+
+
+def take_copies(book_ids):
+    """
+    Take one copy per occurrence of each book id.
+
+    Each distinct quantity is a single conditional UPDATE that never drives
+    copies_available below zero. If any book is short the whole change is
+    rolled back and InsufficientCopies lists the books that could not be
+    satisfied. Returns how many books ran out of copies.
+    """
+    counts = Counter(book_ids)
+    if not counts:
+        return 0
+
+    try:
+        with transaction.atomic():
+            for quantity, ids in _group_by_quantity(counts):
+                updated = Book.objects.filter(
+                    id__in=ids,
+                    copies_available__gte=quantity
+                ).update(copies_available=F('copies_available') - quantity)
+                if updated != len(ids):
+                    raise _Shortage()
+            _invalidate_on_commit(counts)
+            # Every book had at least one copy before, so those at zero now
+            # are the ones this call emptied
+            return Book.objects.filter(id__in=counts, copies_available=0).count()
+    except _Shortage:
+        # The decrements are rolled back by now, so current stock tells us
+        # exactly which books were short.
+        books = Book.objects.filter(id__in=counts).order_by('title')
+        raise InsufficientCopies([book for book in books if book.copies_available < counts[book.id]])
+
+
+def return_copies(book_ids):
+    """Put back one copy per occurrence of each book id; returns how many books came back into stock."""
+    counts = Counter(book_ids)
+    if not counts:
+        return 0
+
+    with transaction.atomic():
+        for quantity, ids in _group_by_quantity(counts):
+            Book.objects.filter(id__in=ids).update(copies_available=F('copies_available') + quantity)
+        _invalidate_on_commit(counts)
+        stock = Book.objects.filter(id__in=counts).values_list('id', 'copies_available')
+        return sum(1 for book_id, available in stock if available == counts[book_id])
+
+
+def approve_loan(loan, approved_by):
+    """
+    Approve a pending borrowing request and take its copies atomically.
+
+    Raises LoanAlreadyProcessed when another admin approved or rejected it
+    first, and InsufficientCopies (with nothing changed) when a book has no
+    copy left.
+    """
+    reminder_stage, next_reminder_at = first_reminder(loan)
+    with transaction.atomic():
+        claimed = Transaction.objects.filter(
+            pk=loan.pk,
+            approval_status='pending'
+        ).update(
+            approval_status='approved',
+            approved_by=approved_by,
+            approved_at=timezone.now(),
+            reminder_stage=reminder_stage,
+            next_reminder_at=next_reminder_at
+        )
+        if not claimed:
+            raise LoanAlreadyProcessed()
+
+        emptied = take_copies(loan.items.values_list('book_id', flat=True))
+        adjust(
+            pending_loans=-1,
+            borrowed_loans=int(loan.status == 'borrowed'),
+            available_books=-emptied
+        )
+        refresh_loan_summary(loan.student_id)
+        bump_on_commit('transactions', f'student:{loan.student_id}')
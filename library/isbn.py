@@ -0,0 +1,49 @@
+import re
+
+
+def _strip(raw_isbn):
+    return re.sub(r'[^0-9A-Za-z]', '', raw_isbn or '').upper()
+
+
+def is_valid_isbn10(code):
+    if not re.fullmatch(r'[0-9]{9}[0-9X]', code):
+        return False
+    total = 0
+    for position, char in enumerate(code):
+        value = 10 if char == 'X' else int(char)
+        total += value * (10 - position)
+    return total % 11 == 0
+
+
+def isbn13_check_digit(first_twelve):
+    total = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(first_twelve))
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_isbn13(code):
+    if not re.fullmatch(r'97[89][0-9]{10}', code):
+        return False
+    return isbn13_check_digit(code[:12]) == code[12]
+
+
+def looks_like_mistyped_isbn(raw_isbn):
+    """True for input shaped like an ISBN-13 (978/979 + 10 digits) whose check digit is wrong."""
+    code = _strip(raw_isbn)
+    return bool(re.fullmatch(r'97[89][0-9]{10}', code)) and not is_valid_isbn13(code)
+
+
+def canonicalize_isbn(raw_isbn):
+    """
+    Return the canonical lookup key for a scanned or typed ISBN.
+
+    Valid ISBN-10s are converted to ISBN-13 so both barcodes of the same
+    title resolve to one key. Codes that fail the checksum (local accession
+    numbers, typos) fall back to their upper-cased alphanumeric form so they
+    still match exactly what was catalogued; BookForm and the CSV importer
+    reject ISBN-13-shaped codes with a bad check digit before they get here.
+    """
+    code = _strip(raw_isbn)
+    if len(code) == 10 and is_valid_isbn10(code):
+        first_twelve = '978' + code[:9]
+        return first_twelve + isbn13_check_digit(first_twelve)
+    return code
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import logging
+
+from django.db import transaction, DatabaseError, IntegrityError
+
+from .circulation import create_loan, return_items, ItemsAlreadyReturned
+from .inventory import InsufficientCopies
+from .isbn import canonicalize_isbn
+from .models import Student, Book, TransactionItem, KioskOperation
+
+
+logger = logging.getLogger(__name__)
+
+MAX_OPERATIONS_PER_BATCH = 100
+
+
+class OperationRejected(Exception):
+    pass
+
+
+def _student(student_id):
+    try:
+        return Student.objects.get(student_id=student_id, is_approved=True)
+    except Student.DoesNotExist:
+        raise OperationRejected('Student not found or not approved')
+
+
+def _canonical_isbns(op):
+    raw = op.get('isbns')
+    # A bare string would otherwise be read one character at a time
+    if not isinstance(raw, list) or not all(isinstance(isbn, str) for isbn in raw):
+        raise OperationRejected('isbns must be a list of strings')
+    isbns = {canonicalize_isbn(isbn) for isbn in raw}
+    isbns.discard('')
+    if not isbns:
+        raise OperationRejected('No ISBNs given')
+    return isbns
+
+
+def _borrow(op, user):
+    student = _student(op.get('student_id'))
+    isbns = _canonical_isbns(op)
+    book_ids = dict(Book.objects.filter(canonical_isbn__in=isbns).values_list('canonical_isbn', 'id'))
+    missing = isbns - book_ids.keys()
+    if missing:
+        raise OperationRejected(f'Book not found: {", ".join(sorted(missing))}')
+
+    try:
+        loan = create_loan(student, book_ids.values(), user)
+    except InsufficientCopies as e:
+        raise OperationRejected(f'Unavailable: {", ".join(book.title for book in e.books)}')
+    return {'transaction_id': loan.id, 'transaction_code': loan.transaction_code, 'books': len(book_ids)}
+
+
+def _return(op, user):
+    student = _student(op.get('student_id'))
+    isbns = _canonical_isbns(op)
+    item_ids = list(TransactionItem.objects.filter(
+        transaction__student=student,
+        transaction__approval_status='approved',
+        status='borrowed',
+        book__canonical_isbn__in=isbns
+    ).values_list('id', flat=True))
+    if not item_ids:
+        raise OperationRejected('None of these books are borrowed by this student')
+
+    try:
+        returned = return_items(student, item_ids)
+    except ItemsAlreadyReturned:
+        raise OperationRejected('Some of these books were already returned')
+    return {'returned': len(returned)}
+
+
+HANDLERS = {
+    'borrow': _borrow,
+    'return': _return,
+}
+
+
+def _fingerprint(op):
+    payload = {'type': op.get('type'), 'student_id': op.get('student_id'), 'isbns': op.get('isbns')}
+    if isinstance(payload['isbns'], list):
+        payload['isbns'] = sorted(map(str, payload['isbns']))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _replay(key, fingerprint):
+    previous = KioskOperation.objects.get(idempotency_key=key)
+    if previous.payload_hash and previous.payload_hash != fingerprint:
+        return {
+            'key': key, 'status': 'rejected', 'replayed': True,
+            'error': 'Idempotency key was already used for a different operation'
+        }
+    return {'key': key, 'status': previous.status, 'replayed': True, **previous.result}
+
+
+def _apply(op, user):
+    key = str(op.get('key') or '').strip()
+    operation = op.get('type')
+    handler = HANDLERS.get(operation) if isinstance(operation, str) else None
+    if not key or len(key) > 64:
+        return {'key': key, 'status': 'rejected', 'replayed': False, 'error': 'Missing or invalid idempotency key'}
+    if handler is None:
+        return {'key': key, 'status': 'rejected', 'replayed': False, 'error': 'Unknown operation type'}
+
+    fingerprint = _fingerprint(op)
+    if KioskOperation.objects.filter(idempotency_key=key).exists():
+        return _replay(key, fingerprint)
+
+    # Savepoint per operation: whatever happens below, a failed operation
+    # leaves no partial writes behind
+    with transaction.atomic():
+        try:
+            # Claim the key first, in its own savepoint, so the only
+            # IntegrityError treated as a replay is a duplicate key
+            with transaction.atomic():
+                record = KioskOperation.objects.create(
+                    idempotency_key=key,
+                    operation=op['type'],
+                    student_id=str(op.get('student_id') or '')[:50],
+                    status='applied',
+                    payload_hash=fingerprint,
+                    created_by=user
+                )
+        except IntegrityError:
+            # Another kiosk request with the same key won the race
+            return _replay(key, fingerprint)
+
+        try:
+            with transaction.atomic():
+                result = handler(op, user)
+            record.status = 'applied'
+        except OperationRejected as e:
+            record.status, result = 'rejected', {'error': str(e)}
+        except DatabaseError:
+            # Not the client's fault: drop the key claim too, so resending
+            # the operation tries it again instead of replaying a failure
+            logger.exception('Kiosk operation %s failed', key)
+            transaction.set_rollback(True)
+            return {'key': key, 'status': 'error', 'replayed': False, 'error': 'Server error, please resend'}
+        record.result = result
+        record.save(update_fields=['status', 'result'])
+
+    return {'key': key, 'status': record.status, 'replayed': False, **result}
+
+
+def apply_operations(operations, user):
+    """
+    Apply queued kiosk operations in order inside one DB transaction.
+
+    Every operation carries a client-generated idempotency key. A key that
+    was already processed returns its stored result instead of being applied
+    again, so a kiosk can safely resend a whole queue after a network drop.
+    """
+    with transaction.atomic():
+        return [_apply(op if isinstance(op, dict) else {}, user) for op in operations]
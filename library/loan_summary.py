@@ -0,0 +1,95 @@
+from django.db import transaction
+from django.db.models import Count, Q, Min
+
+from .models import Student, Transaction, TransactionItem, StudentLoanSummary
+
+
+HISTORY_LENGTH = 5
+
+
+def refresh_loan_summary(student_id):
+    """
+    Recompute one student's StudentLoanSummary from their transactions.
+
+    Called inside the borrow/approve/return transaction, so the summary
+    commits or rolls back with the change. Costs a fixed handful of queries
+    regardless of how many loans the student has.
+    """
+    loans = Transaction.objects.filter(student_id=student_id)
+    open_filter = Q(approval_status='approved', status='borrowed')
+
+    totals = loans.aggregate(
+        open_loan_count=Count('id', filter=open_filter),
+        pending_loan_count=Count('id', filter=Q(approval_status='pending')),
+        next_due_date=Min('due_date', filter=open_filter),
+    )
+
+    open_loans = list(loans.filter(open_filter).order_by('due_date', 'id').values(
+        'id', 'transaction_code', 'due_date', 'open_item_count'
+    ))
+    titles = {}
+    for transaction_id, title in TransactionItem.objects.filter(
+        transaction__in=loans.filter(open_filter)
+    ).order_by('book__title').values_list('transaction_id', 'book__title'):
+        titles.setdefault(transaction_id, []).append(title)
+
+    history = loans.filter(approval_status='approved').order_by('-borrowed_date', '-id').values(
+        'transaction_code', 'borrowed_date', 'item_count', 'status'
+    )[:HISTORY_LENGTH]
+
+    summary = StudentLoanSummary(
+        student_id=student_id,
+        **totals,
+        open_item_count=sum(loan['open_item_count'] for loan in open_loans),
+        open_loans=[
+            {
+                'transaction_code': loan['transaction_code'],
+                'due_date': loan['due_date'],
+                'titles': titles.get(loan['id'], []),
+            }
+            for loan in open_loans
+        ],
+        history=list(history),
+    )
+    # One upsert whether or not the row exists yet
+    StudentLoanSummary.objects.bulk_create(
+        [summary],
+        update_conflicts=True,
+        unique_fields=['student'],
+        update_fields=[
+            'open_loan_count', 'open_item_count', 'pending_loan_count', 'next_due_date',
+            'open_loans', 'history', 'updated_at'
+        ]
+    )
+    return summary
+
+
+def get_loan_summary(student):
+    """The student's summary, built on first use for students who have none yet."""
+    try:
+        return student.loan_summary
+    except StudentLoanSummary.DoesNotExist:
+        return refresh_loan_summary(student.id)
+
+
+def refresh_loan_summaries_for_book(book_id):
+    """
+    Rebuild the summaries whose open loans include `book_id`, whose titles
+    are copied into them (e.g. after the book is renamed). Returns the
+    student ids refreshed.
+    """
+    student_ids = set(TransactionItem.objects.filter(
+        book_id=book_id, transaction__approval_status='approved', transaction__status='borrowed'
+    ).values_list('transaction__student_id', flat=True))
+    for student_id in student_ids:
+        refresh_loan_summary(student_id)
+    return student_ids
+
+
+def refresh_loan_summary_on_commit(student_id):
+    # Used on deletes: when the student is being deleted too, building a
+    # new summary mid-cascade would reference a row about to disappear
+    def refresh():
+        if Student.objects.filter(id=student_id).exists():
+            refresh_loan_summary(student_id)
+    transaction.on_commit(refresh)
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.recommendations import TOP_N, rebuild_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the "readers also borrowed" table from approved loan history (needs NumPy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=TOP_N, help='Neighbours kept per book')
+
+    def handle(self, *args, **options):
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            raise CommandError('NumPy is required: pip install "repl-nix-workspace[recommendations]" or pip install numpy')
+
+        started = time.monotonic()
+        result = rebuild_recommendations(top_n=options['top'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {result['rows']} recommendation(s) for {result['books']} book(s) "
+            f"from {result['items']} loaned item(s) in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from library.models import OutboxMessage
+from library.outbox import DEFAULT_BATCH_SIZE, DEFAULT_WORKERS, deliver_outbox, requeue_dead
+
+
+class Command(BaseCommand):
+    help = (
+        'Deliver queued outbox mail on a thread pool. Failures are retried with '
+        'exponential backoff and dead-lettered when permanent. Delivery is at '
+        'least once: a message whose claim expires mid-send may be sent twice. To measure '
+        'throughput locally, start a stand-in with `python -m aiosmtpd -n -l '
+        'localhost:1025` and pass --smtp-host localhost --smtp-port 1025.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Sending threads, one SMTP connection each')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Messages claimed per round')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new mail instead of exiting when drained')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls with --loop')
+        parser.add_argument('--requeue-dead', action='store_true', help='Retry dead-lettered messages from scratch first')
+        parser.add_argument('--smtp-host', help='Override EMAIL_HOST (disables TLS and authentication)')
+        parser.add_argument('--smtp-port', type=int, help='Override EMAIL_PORT')
+
+    def connection_kwargs(self, options):
+        if not options['smtp_host']:
+            return {}
+        return {
+            'backend': 'django.core.mail.backends.smtp.EmailBackend',
+            'host': options['smtp_host'],
+            'port': options['smtp_port'] or 25,
+            'username': '',
+            'password': '',
+            'use_tls': False,
+            'use_ssl': False,
+        }
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeue_dead()} dead-lettered message(s)'))
+
+        while True:
+            result = deliver_outbox(
+                workers=max(1, options['workers']),
+                batch_size=max(1, options['batch_size']),
+                connection_kwargs=self.connection_kwargs(options)
+            )
+            if result['batches'] or not options['loop']:
+                self.report(result)
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def report(self, result):
+        rate = result['sent'] / result['elapsed'] if result['elapsed'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {result['sent']} message(s) in {result['elapsed']:.1f}s ({rate:.0f}/s); "
+            f"{result['retried']} scheduled for retry, {result['dead']} dead-lettered"
+        ))
+        if result['stale']:
+            self.stdout.write(self.style.WARNING(
+                f"{result['stale']} result(s) dropped because their claim expired; those messages will be sent again"
+            ))
+        backlog = OutboxMessage.objects.filter(status='pending').count()
+        if backlog:
+            self.stdout.write(f'{backlog} message(s) still pending')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from library.overdue import flag_overdue
+
+
+class Command(BaseCommand):
+    help = 'Flag loans that have become overdue since the last sweep (run periodically, e.g. from cron)'
+
+    def handle(self, *args, **options):
+        flagged = flag_overdue()
+        self.stdout.write(self.style.SUCCESS(f'Flagged {flagged} newly overdue loan(s)'))
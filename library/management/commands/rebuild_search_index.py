@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from library.search import FTS_TABLE, fts_available
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text catalog search index from the Book table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--optimize', action='store_true', help='Merge index segments after rebuilding')
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            self.stdout.write(self.style.WARNING('Full-text search needs SQLite FTS5; nothing to rebuild'))
+            return
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            if options['optimize']:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+            cursor.execute(f"SELECT count(*) FROM {FTS_TABLE}")
+            count = cursor.fetchone()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt for {count} book(s)'))
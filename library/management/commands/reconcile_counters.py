@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from library.counters import COUNTER_QUERIES, rebuild_counters
+from library.models import LibraryCounter
+
+
+class Command(BaseCommand):
+    help = 'Recount the dashboard counters from the source tables and report any drift'
+
+    def handle(self, *args, **options):
+        stored = dict(LibraryCounter.objects.values_list('name', 'value'))
+        actual = rebuild_counters()
+
+        drifted = 0
+        for name in COUNTER_QUERIES:
+            before = stored.get(name)
+            if before != actual[name]:
+                drifted += 1
+                self.stdout.write(self.style.WARNING(f'{name}: {before} -> {actual[name]}'))
+
+        if drifted:
+            self.stdout.write(self.style.SUCCESS(f'Corrected {drifted} counter(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All counters were accurate'))
@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from library.rollups import DEFAULT_LAG, roll_up, reset_rollups
+
+
+class Command(BaseCommand):
+    help = 'Fold circulation activity since the last run into the daily rollup tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lag', type=int, default=int(DEFAULT_LAG.total_seconds()),
+            help='Leave activity younger than this many seconds for the next run'
+        )
+        parser.add_argument('--rebuild', action='store_true', help='Drop all rollups and recompute them from the beginning')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            reset_rollups()
+            self.stdout.write(self.style.WARNING('Rollups cleared; recomputing from the beginning'))
+
+        result = roll_up(lag=timedelta(seconds=options['lag']))
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {result['loans']} loan(s) and {result['returns']} return(s) "
+            f"from {result['since']:%Y-%m-%d %H:%M:%S} to {result['until']:%Y-%m-%d %H:%M:%S} "
+            f"({result['rows']} rollup row(s) written)"
+        ))
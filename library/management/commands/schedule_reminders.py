@@ -0,0 +1,65 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from library.reminders import DEFAULT_BATCH_SIZE, run_due_reminders
+
+
+class Command(BaseCommand):
+    help = (
+        'Queue every loan reminder that has come due (after borrowing, before the due '
+        'date, overdue) in the outbox. Runs as a daemon unless --once is given; '
+        'deliver_outbox sends the mail.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Catch up on everything due now, then exit')
+        parser.add_argument('--interval', type=float, default=60, help='Seconds between ticks in daemon mode')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Loans handled per tick')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        if not options['once']:
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+            self.stdout.write(f"Reminder scheduler running every {options['interval']:g}s")
+
+        batch_size = max(1, options['batch_size'])
+        while not self.stopping:
+            close_old_connections()
+            total = self.drain(batch_size)
+            if total['processed'] or options['once']:
+                self.report(total)
+            if options['once']:
+                break
+            self.sleep(options['interval'])
+
+    def drain(self, batch_size):
+        total = {'processed': 0, 'queued': {}, 'skipped': 0}
+        while not self.stopping:
+            result = run_due_reminders(batch_size=batch_size)
+            total['processed'] += result['processed']
+            total['skipped'] += result['skipped']
+            for stage, count in result['queued'].items():
+                total['queued'][stage] = total['queued'].get(stage, 0) + count
+            # A short batch means nothing else is due yet
+            if result['processed'] < batch_size:
+                break
+        return total
+
+    def sleep(self, seconds):
+        deadline = time.monotonic() + seconds
+        while not self.stopping and time.monotonic() < deadline:
+            time.sleep(min(1, deadline - time.monotonic()))
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def report(self, total):
+        queued = ', '.join(f'{count} {stage}' for stage, count in total['queued'].items() if count) or 'none'
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {total['processed']} loan(s); queued reminders: {queued}"
+            + (f"; {total['skipped']} without an email address" if total['skipped'] else '')
+        ))
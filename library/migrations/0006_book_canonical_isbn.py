@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+from library.isbn import canonicalize_isbn
+
+
+def backfill_canonical_isbn(apps, schema_editor):
+    Book = apps.get_model('library', 'Book')
+    seen = set()
+    for book in Book.objects.order_by('id').only('id', 'isbn').iterator():
+        canonical = canonicalize_isbn(book.isbn) or None
+        # Two legacy rows spelling the same ISBN differently would violate the
+        # unique index; the older row keeps the key and the newer one stays
+        # unset until an admin merges or corrects it.
+        if canonical in seen:
+            canonical = None
+        if canonical:
+            seen.add(canonical)
+        Book.objects.filter(id=book.id).update(canonical_isbn=canonical)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0005_alter_book_isbn'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='canonical_isbn',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_canonical_isbn, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0006_book_canonical_isbn'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KioskOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=64, unique=True)),
+                ('operation', models.CharField(choices=[('borrow', 'Borrow'), ('return', 'Return')], max_length=10)),
+                ('student_id', models.CharField(max_length=50)),
+                ('status', models.CharField(choices=[('applied', 'Applied'), ('rejected', 'Rejected')], max_length=10)),
+                ('result', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Kiosk Operation',
+                'verbose_name_plural': 'Kiosk Operations',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
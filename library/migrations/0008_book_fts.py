@@ -0,0 +1,64 @@
+from django.db import migrations
+
+
+# External-content FTS5 index over library_book. The triggers only fire for
+# the indexed columns so inventory updates (copies_available) stay cheap.
+CREATE_FTS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS library_book_fts USING fts5(
+        title, author, publisher, category, description,
+        content='library_book', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS library_book_fts_ai AFTER INSERT ON library_book BEGIN
+        INSERT INTO library_book_fts(rowid, title, author, publisher, category, description)
+        VALUES (new.id, new.title, new.author, new.publisher, new.category, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS library_book_fts_ad AFTER DELETE ON library_book BEGIN
+        INSERT INTO library_book_fts(library_book_fts, rowid, title, author, publisher, category, description)
+        VALUES ('delete', old.id, old.title, old.author, old.publisher, old.category, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS library_book_fts_au
+    AFTER UPDATE OF title, author, publisher, category, description ON library_book BEGIN
+        INSERT INTO library_book_fts(library_book_fts, rowid, title, author, publisher, category, description)
+        VALUES ('delete', old.id, old.title, old.author, old.publisher, old.category, old.description);
+        INSERT INTO library_book_fts(rowid, title, author, publisher, category, description)
+        VALUES (new.id, new.title, new.author, new.publisher, new.category, new.description);
+    END
+    """,
+    "INSERT INTO library_book_fts(library_book_fts) VALUES ('rebuild')",
+]
+
+DROP_FTS = [
+    "DROP TRIGGER IF EXISTS library_book_fts_au",
+    "DROP TRIGGER IF EXISTS library_book_fts_ad",
+    "DROP TRIGGER IF EXISTS library_book_fts_ai",
+    "DROP TABLE IF EXISTS library_book_fts",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        # FTS5 is SQLite-only; other backends fall back to icontains search
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0007_kioskoperation'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE_FTS), _run(DROP_FTS)),
+    ]
@@ -0,0 +1,51 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+from library.text import words, normalize_student_id
+
+
+def backfill_student_search(apps, schema_editor):
+    Student = apps.get_model('library', 'Student')
+    StudentSearchToken = apps.get_model('library', 'StudentSearchToken')
+    tokens = []
+    for student in Student.objects.only('id', 'student_id', 'last_name', 'first_name', 'middle_name').iterator():
+        Student.objects.filter(id=student.id).update(search_id=normalize_student_id(student.student_id))
+        tokens += [
+            StudentSearchToken(student_id=student.id, field='last', token=token[:100])
+            for token in dict.fromkeys(words(student.last_name))
+        ]
+        tokens += [
+            StudentSearchToken(student_id=student.id, field='given', token=token[:100])
+            for token in dict.fromkeys(words(f'{student.first_name} {student.middle_name}'))
+        ]
+    StudentSearchToken.objects.bulk_create(tokens, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0009_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='search_id',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=50),
+        ),
+        migrations.CreateModel(
+            name='StudentSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('last', 'Last name'), ('given', 'First or middle name')], max_length=5)),
+                ('token', models.CharField(max_length=100)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='library.student')),
+            ],
+            options={
+                'verbose_name': 'Student Search Token',
+                'verbose_name_plural': 'Student Search Tokens',
+                'indexes': [models.Index(fields=['token', 'field', 'student'], name='student_token_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_student_search, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    Student = apps.get_model('library', 'Student')
+    Book = apps.get_model('library', 'Book')
+    Transaction = apps.get_model('library', 'Transaction')
+    LibraryCounter = apps.get_model('library', 'LibraryCounter')
+    values = {
+        'students': Student.objects.count(),
+        'pending_registrations': Student.objects.filter(user__isnull=False, is_approved=False).count(),
+        'books': Book.objects.count(),
+        'available_books': Book.objects.filter(copies_available__gt=0).count(),
+        'borrowed_loans': Transaction.objects.filter(status='borrowed', approval_status='approved').count(),
+        'pending_loans': Transaction.objects.filter(approval_status='pending').count(),
+    }
+    LibraryCounter.objects.bulk_create([LibraryCounter(name=name, value=value) for name, value in values.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0010_student_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LibraryCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Library Counter',
+                'verbose_name_plural': 'Library Counters',
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
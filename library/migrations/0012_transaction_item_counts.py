@@ -0,0 +1,37 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_item_counts(apps, schema_editor):
+    Transaction = apps.get_model('library', 'Transaction')
+    TransactionItem = apps.get_model('library', 'TransactionItem')
+
+    def count(**filters):
+        return Coalesce(Subquery(
+            TransactionItem.objects.filter(transaction=OuterRef('pk'), **filters)
+            .order_by().values('transaction').annotate(n=Count('id')).values('n')
+        ), 0)
+
+    Transaction.objects.update(item_count=count(), open_item_count=count(status='borrowed'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0011_librarycounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='open_item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_item_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0012_transaction_item_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentLoanSummary',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='loan_summary', serialize=False, to='library.student')),
+                ('open_loan_count', models.PositiveIntegerField(default=0)),
+                ('open_item_count', models.PositiveIntegerField(default=0)),
+                ('pending_loan_count', models.PositiveIntegerField(default=0)),
+                ('next_due_date', models.DateTimeField(blank=True, null=True)),
+                ('open_loans', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('history', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Student Loan Summary',
+                'verbose_name_plural': 'Student Loan Summaries',
+            },
+        ),
+    ]
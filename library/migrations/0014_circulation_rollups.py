@@ -0,0 +1,91 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0013_studentloansummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBookStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('loans', models.PositiveIntegerField(default=0)),
+                ('returns', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Daily Book Stat',
+                'verbose_name_plural': 'Daily Book Stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCategoryStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(max_length=100)),
+                ('loans', models.PositiveIntegerField(default=0)),
+                ('returns', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Daily Category Stat',
+                'verbose_name_plural': 'Daily Category Stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCohortStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('course', models.CharField(max_length=100)),
+                ('year', models.CharField(max_length=20)),
+                ('loans', models.PositiveIntegerField(default=0)),
+                ('returns', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Daily Cohort Stat',
+                'verbose_name_plural': 'Daily Cohort Stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('processed_until', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Rollup Watermark',
+                'verbose_name_plural': 'Rollup Watermarks',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['approved_at'], name='txn_approved_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionitem',
+            index=models.Index(fields=['return_date'], name='item_return_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailybookstat',
+            name='book',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='library.book'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailycategorystat',
+            constraint=models.UniqueConstraint(fields=('day', 'category'), name='daily_category_stat_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailycohortstat',
+            constraint=models.UniqueConstraint(fields=('day', 'course', 'year'), name='daily_cohort_stat_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailybookstat',
+            constraint=models.UniqueConstraint(fields=('day', 'book'), name='daily_book_stat_unique'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0015_bookrecommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='overdue_flagged_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['status', 'approval_status', 'due_date'], name='txn_overdue_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def schedule_open_loans(apps, schema_editor):
+    # Loans that already had the old 2-day reminder wait for the before-due
+    # one; the scheduler sends only the latest stage that has come due
+    Transaction = apps.get_model('library', 'Transaction')
+    open_loans = Transaction.objects.filter(status='borrowed', approval_status='approved')
+    open_loans.filter(reminder_sent=False).update(
+        reminder_stage='after_borrow', next_reminder_at=F('borrowed_date') + timedelta(days=2)
+    )
+    open_loans.filter(reminder_sent=True).update(
+        reminder_stage='before_due', next_reminder_at=F('due_date') - timedelta(days=1)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0017_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='next_reminder_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='reminder_stage',
+            field=models.CharField(blank=True, choices=[('after_borrow', 'After Borrowing'), ('before_due', 'Before Due Date'), ('overdue', 'Overdue')], editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['next_reminder_at'], name='txn_next_reminder_idx'),
+        ),
+        migrations.RunPython(schedule_open_loans, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0018_reminder_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PosCartRecord',
+            fields=[
+                ('session_key', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('book_ids', models.JSONField(default=list)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'POS Cart',
+                'verbose_name_plural': 'POS Carts',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0019_poscartrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kioskoperation',
+            name='payload_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
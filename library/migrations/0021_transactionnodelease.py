@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0020_kioskoperation_payload_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionNodeLease',
+            fields=[
+                ('node_id', models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+                ('owner', models.CharField(max_length=100)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Transaction Node Lease',
+                'verbose_name_plural': 'Transaction Node Leases',
+            },
+        ),
+    ]
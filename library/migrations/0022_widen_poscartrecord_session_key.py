@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0021_transactionnodelease'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='poscartrecord',
+            name='session_key',
+            field=models.CharField(max_length=64, primary_key=True, serialize=False),
+        ),
+    ]
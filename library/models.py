@@ -1,9 +1,15 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 import random
 import string
 from datetime import timedelta
+from .isbn import canonicalize_isbn, looks_like_mistyped_isbn
+from .text import normalize_student_id
+from .codes import transaction_codes
 
 
 class UserManager(BaseUserManager):
@@ -62,10 +68,18 @@ class Student(models.Model):
     is_verified = models.BooleanField(default=False)
     is_approved = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    search_id = models.CharField(max_length=50, blank=True, editable=False, db_index=True)
     
     def __str__(self):
         return f"{self.student_id} - {self.last_name}, {self.first_name}"
     
+    def save(self, *args, **kwargs):
+        self.search_id = normalize_student_id(self.student_id)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'student_id' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'search_id'}
+        super().save(*args, **kwargs)
+    
     def get_full_name(self):
         if self.middle_name:
             return f"{self.last_name}, {self.first_name} {self.middle_name}"
@@ -74,10 +88,43 @@ class Student(models.Model):
     class Meta:
         verbose_name = 'Student'
         verbose_name_plural = 'Students'
+        indexes = [
+            models.Index(fields=['last_name', 'first_name', 'id'], name='student_name_keyset_idx'),
+        ]
+
+
+class StudentSearchToken(models.Model):
+    FIELD_CHOICES = (
+        ('last', 'Last name'),
+        ('given', 'First or middle name'),
+    )
+    
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='search_tokens')
+    field = models.CharField(max_length=5, choices=FIELD_CHOICES)
+    token = models.CharField(max_length=100)
+    
+    def __str__(self):
+        return f"{self.token} ({self.field}) - {self.student_id}"
+    
+    class Meta:
+        verbose_name = 'Student Search Token'
+        verbose_name_plural = 'Student Search Tokens'
+        indexes = [
+            models.Index(fields=['token', 'field', 'student'], name='student_token_idx'),
+        ]
+
+
+class BookManager(models.Manager):
+    def find_by_isbn(self, raw_isbn):
+        canonical = canonicalize_isbn(raw_isbn)
+        if not canonical:
+            return None
+        return self.filter(canonical_isbn=canonical).first()
 
 
 class Book(models.Model):
     isbn = models.CharField(max_length=20, unique=True)
+    canonical_isbn = models.CharField(max_length=20, unique=True, null=True, blank=True, editable=False)
     title = models.CharField(max_length=200)
     author = models.CharField(max_length=200)
     category = models.CharField(max_length=100)
@@ -89,9 +136,34 @@ class Book(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = BookManager()
+    
     def __str__(self):
         return f"{self.title} by {self.author}"
     
+    def clean_fields(self, exclude=None):
+        super().clean_fields(exclude)
+        if (exclude is None or 'isbn' not in exclude) and looks_like_mistyped_isbn(self.isbn):
+            raise ValidationError({'isbn': 'This ISBN-13 has an invalid check digit'})
+    
+    def validate_unique(self, exclude=None):
+        # canonical_isbn is not editable, so ModelForms (including the
+        # admin's) never check it; two spellings of one ISBN would only
+        # fail on the INSERT
+        super().validate_unique(exclude)
+        if exclude is not None and 'isbn' in exclude:
+            return
+        canonical = canonicalize_isbn(self.isbn)
+        if canonical and Book.objects.filter(canonical_isbn=canonical).exclude(pk=self.pk).exists():
+            raise ValidationError({'isbn': 'A book with this ISBN already exists'})
+    
+    def save(self, *args, **kwargs):
+        self.canonical_isbn = canonicalize_isbn(self.isbn) or None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'isbn' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'canonical_isbn'}
+        super().save(*args, **kwargs)
+    
     def is_available(self):
         return self.copies_available > 0
     
@@ -99,6 +171,18 @@ class Book(models.Model):
         verbose_name = 'Book'
         verbose_name_plural = 'Books'
         ordering = ['title']
+        indexes = [
+            models.Index(fields=['title', 'id'], name='book_title_keyset_idx'),
+        ]
+
+
+class TransactionQuerySet(models.QuerySet):
+    def open(self):
+        return self.filter(status='borrowed', approval_status='approved')
+    
+    def overdue(self, now=None):
+        """Open loans past their due date; served by txn_overdue_idx."""
+        return self.open().filter(due_date__lt=now or timezone.now())
 
 
 class Transaction(models.Model):
@@ -113,6 +197,12 @@ class Transaction(models.Model):
         ('rejected', 'Rejected'),
     )
     
+    REMINDER_STAGE_CHOICES = (
+        ('after_borrow', 'After Borrowing'),
+        ('before_due', 'Before Due Date'),
+        ('overdue', 'Overdue'),
+    )
+    
     transaction_code = models.CharField(max_length=50, unique=True)
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     borrowed_date = models.DateTimeField(default=timezone.now)
@@ -124,10 +214,21 @@ class Transaction(models.Model):
     approved_at = models.DateTimeField(null=True, blank=True)
     reminder_sent = models.BooleanField(default=False)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    # Denormalized from the items so listings need no per-row COUNT
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+    open_item_count = models.PositiveIntegerField(default=0, editable=False)
+    # Set by the flag_overdue sweep the first time the loan is seen overdue;
+    # the overdue report marks loans new since the latest sweep
+    overdue_flagged_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # The reminder scheduler's cursor: which reminder is next and when it is
+    # due. NULL once the loan needs no more reminders.
+    reminder_stage = models.CharField(max_length=20, choices=REMINDER_STAGE_CHOICES, blank=True, editable=False)
+    next_reminder_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    objects = TransactionQuerySet.as_manager()
     
     def __str__(self):
-        book_count = self.items.count()
-        return f"{self.transaction_code} - {self.student.student_id} - {book_count} book(s)"
+        return f"{self.transaction_code} - {self.student.student_id} - {self.item_count} book(s)"
     
     def is_overdue(self):
         if self.status == 'returned':
@@ -142,14 +243,18 @@ class Transaction(models.Model):
     
     @staticmethod
     def generate_transaction_code(school_code='ISU'):
-        timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-        random_suffix = ''.join(random.choices(string.digits, k=5))
-        return f"{school_code}{random_suffix}{timestamp}"
+        return transaction_codes.generate(school_code)
     
     class Meta:
         verbose_name = 'Transaction'
         verbose_name_plural = 'Transactions'
         ordering = ['-borrowed_date']
+        indexes = [
+            models.Index(fields=['approval_status', '-borrowed_date', '-id'], name='txn_approval_keyset_idx'),
+            models.Index(fields=['approved_at'], name='txn_approved_at_idx'),
+            models.Index(fields=['status', 'approval_status', 'due_date'], name='txn_overdue_idx'),
+            models.Index(fields=['next_reminder_at'], name='txn_next_reminder_idx'),
+        ]
 
 
 class TransactionItem(models.Model):
@@ -169,6 +274,172 @@ class TransactionItem(models.Model):
         verbose_name = 'Transaction Item'
         verbose_name_plural = 'Transaction Items'
         ordering = ['book__title']
+        indexes = [
+            models.Index(fields=['return_date'], name='item_return_date_idx'),
+        ]
+
+
+class KioskOperation(models.Model):
+    OPERATION_CHOICES = (
+        ('borrow', 'Borrow'),
+        ('return', 'Return'),
+    )
+    
+    STATUS_CHOICES = (
+        ('applied', 'Applied'),
+        ('rejected', 'Rejected'),
+    )
+    
+    idempotency_key = models.CharField(max_length=64, unique=True)
+    operation = models.CharField(max_length=10, choices=OPERATION_CHOICES)
+    student_id = models.CharField(max_length=50)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    result = models.JSONField(default=dict)
+    # Fingerprint of the request, so a reused key with a different payload is caught
+    payload_hash = models.CharField(max_length=64, blank=True, editable=False)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.idempotency_key} - {self.operation} - {self.status}"
+    
+    class Meta:
+        verbose_name = 'Kiosk Operation'
+        verbose_name_plural = 'Kiosk Operations'
+        ordering = ['-created_at']
+
+
+class StudentLoanSummary(models.Model):
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True, related_name='loan_summary')
+    open_loan_count = models.PositiveIntegerField(default=0)
+    open_item_count = models.PositiveIntegerField(default=0)
+    pending_loan_count = models.PositiveIntegerField(default=0)
+    next_due_date = models.DateTimeField(null=True, blank=True)
+    # [{transaction_code, due_date, titles}] for approved loans still out
+    open_loans = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    # [{transaction_code, borrowed_date, item_count, status}], newest first
+    history = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.student_id} - {self.open_loan_count} open loan(s)"
+    
+    @staticmethod
+    def _with_dates(entries, *fields):
+        # Stored as ISO strings; a freshly built summary still holds datetimes
+        def as_datetime(value):
+            return parse_datetime(value) if isinstance(value, str) else value
+        return [{**entry, **{field: as_datetime(entry[field]) for field in fields}} for entry in entries]
+    
+    def get_open_loans(self):
+        return self._with_dates(self.open_loans, 'due_date')
+    
+    def get_history(self):
+        return self._with_dates(self.history, 'borrowed_date')
+    
+    def overdue_count(self):
+        now = timezone.now()
+        return sum(1 for loan in self.get_open_loans() if loan['due_date'] < now)
+    
+    class Meta:
+        verbose_name = 'Student Loan Summary'
+        verbose_name_plural = 'Student Loan Summaries'
+
+
+class LibraryCounter(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+    
+    class Meta:
+        verbose_name = 'Library Counter'
+        verbose_name_plural = 'Library Counters'
+
+
+class BookRecommendation(models.Model):
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    co_borrowed = models.PositiveIntegerField()
+    
+    def __str__(self):
+        return f"{self.book_id} -> {self.recommended_id} (#{self.rank})"
+    
+    class Meta:
+        verbose_name = 'Book Recommendation'
+        verbose_name_plural = 'Book Recommendations'
+        ordering = ['book', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'rank'], name='book_recommendation_rank_unique'),
+        ]
+
+
+class DailyBookStat(models.Model):
+    day = models.DateField()
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='daily_stats')
+    loans = models.PositiveIntegerField(default=0)
+    returns = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.day} - {self.book_id}: {self.loans} out, {self.returns} in"
+    
+    class Meta:
+        verbose_name = 'Daily Book Stat'
+        verbose_name_plural = 'Daily Book Stats'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'book'], name='daily_book_stat_unique'),
+        ]
+
+
+class DailyCategoryStat(models.Model):
+    day = models.DateField()
+    category = models.CharField(max_length=100)
+    loans = models.PositiveIntegerField(default=0)
+    returns = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.day} - {self.category}: {self.loans} out, {self.returns} in"
+    
+    class Meta:
+        verbose_name = 'Daily Category Stat'
+        verbose_name_plural = 'Daily Category Stats'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category'], name='daily_category_stat_unique'),
+        ]
+
+
+class DailyCohortStat(models.Model):
+    day = models.DateField()
+    course = models.CharField(max_length=100)
+    year = models.CharField(max_length=20)
+    loans = models.PositiveIntegerField(default=0)
+    returns = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.day} - {self.course} {self.year}: {self.loans} out, {self.returns} in"
+    
+    class Meta:
+        verbose_name = 'Daily Cohort Stat'
+        verbose_name_plural = 'Daily Cohort Stats'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'course', 'year'], name='daily_cohort_stat_unique'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    processed_until = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} @ {self.processed_until}"
+    
+    class Meta:
+        verbose_name = 'Rollup Watermark'
+        verbose_name_plural = 'Rollup Watermarks'
 
 
 class VerificationCode(models.Model):
@@ -198,3 +469,65 @@ class VerificationCode(models.Model):
     class Meta:
         verbose_name = 'Verification Code'
         verbose_name_plural = 'Verification Codes'
+
+
+class OutboxMessage(models.Model):
+    # Delivered at least once: a worker whose claim lapses mid-send (see
+    # library/outbox.py) can leave a sent message to be sent again
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead Letter'),
+    )
+    
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    # Earliest time a worker may (re)try; pushed forward while a worker holds it
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True, editable=False)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+    
+    class Meta:
+        verbose_name = 'Outbox Message'
+        verbose_name_plural = 'Outbox Messages'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+
+class PosCartRecord(models.Model):
+    # Database store for POS carts (see library/cart.py)
+    session_key = models.CharField(max_length=64, primary_key=True)
+    book_ids = models.JSONField(default=list)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.session_key} - {len(self.book_ids)} book(s)"
+    
+    class Meta:
+        verbose_name = 'POS Cart'
+        verbose_name_plural = 'POS Carts'
+
+
+class TransactionNodeLease(models.Model):
+    # Node ids claimed by running processes for transaction codes (see library/codes.py)
+    node_id = models.PositiveSmallIntegerField(primary_key=True)
+    owner = models.CharField(max_length=100)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.node_id:04d} - {self.owner}"
+    
+    class Meta:
+        verbose_name = 'Transaction Node Lease'
+        verbose_name_plural = 'Transaction Node Leases'
@@ -0,0 +1,200 @@
+import random
+import smtplib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+
+DEFAULT_WORKERS = 4
+DEFAULT_BATCH_SIZE = 100
+MAX_ATTEMPTS = 8
+BASE_DELAY = timedelta(seconds=30)
+MAX_DELAY = timedelta(hours=1)
+# How long a claimed message stays invisible to other workers
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+def enqueue_email(subject, body, to, from_email=None):
+    """
+    Queue one message for deliver_outbox. Called inside the caller's
+    transaction, so the mail only exists if the change it reports commits.
+    """
+    return OutboxMessage.objects.create(
+        subject=subject, body=body, to=list(to),
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL
+    )
+
+
+def enqueue_many(messages):
+    """Queue EmailMessage objects with one INSERT."""
+    return OutboxMessage.objects.bulk_create([
+        OutboxMessage(
+            subject=message.subject, body=message.body, to=list(message.to),
+            from_email=message.from_email or settings.DEFAULT_FROM_EMAIL
+        )
+        for message in messages
+    ], batch_size=500)
+
+
+def backoff(attempts):
+    """Delay before retry number `attempts`: doubling from BASE_DELAY, capped, with 10% jitter."""
+    delay = min(BASE_DELAY * 2 ** (attempts - 1), MAX_DELAY)
+    return delay * random.uniform(0.9, 1.1)
+
+
+def is_permanent(error):
+    # 5xx replies about this message (bad recipient, rejected content) will
+    # fail again; authentication and connection problems may not
+    if isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, ValueError)):
+        return True
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+def claim(limit, now=None, lease=CLAIM_LEASE):
+    """
+    Claim up to `limit` due messages for this worker and return them.
+
+    The claim moves next_attempt_at past the lease, so concurrent workers
+    skip the rows and a crashed worker's messages come back after the lease.
+    Delivery is therefore at least once: a worker that dies after sending,
+    or takes longer than the lease, leaves the message to be sent again.
+    """
+    now = now or timezone.now()
+    due = OutboxMessage.objects.filter(status='pending', next_attempt_at__lte=now)
+    ids = list(due.order_by('next_attempt_at', 'id').values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    due.filter(id__in=ids).update(claim_token=token, next_attempt_at=now + lease)
+    return list(OutboxMessage.objects.filter(claim_token=token, status='pending').order_by('id'))
+
+
+class Deliverer:
+    """
+    Sends claimed messages on a thread pool, one SMTP connection per thread.
+
+    Worker threads only talk to the mail server; claiming and recording
+    results stay on the calling thread, one UPDATE per outcome.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, connection_kwargs=None):
+        self.connection_kwargs = connection_kwargs or {}
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        # Threads (and so their connections) live as long as the Deliverer
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='outbox')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = get_connection(fail_silently=False, **self.connection_kwargs)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _send(self, message):
+        email = EmailMessage(message.subject, message.body, message.from_email, message.to)
+        connection = self._connection()
+        try:
+            connection.send_messages([email])
+            return message, None
+        except Exception as e:
+            # The session may be unusable; the next message reconnects
+            connection.close()
+            return message, e
+
+    def close(self):
+        self._pool.shutdown()
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+
+    def deliver(self, messages, now=None):
+        results = list(self._pool.map(self._send, messages))
+        return record_results(results, now)
+
+
+def record_results(results, now=None):
+    """
+    Store the outcome of each send. Only rows still held under the claim
+    they were sent with are written: once a lease runs out another worker
+    may claim (and send) the message again, and its outcome wins. Returns
+    sent/retried/dead counts of the rows written and the number of stale
+    results dropped.
+    """
+    now = now or timezone.now()
+    claims = {}
+    for message, error in results:
+        sent, dead, retry = claims.setdefault(message.claim_token, ([], [], []))
+        if error is None:
+            sent.append(message.id)
+        elif is_permanent(error) or message.attempts + 1 >= MAX_ATTEMPTS:
+            message.status = 'dead'
+            dead.append(message)
+        else:
+            message.next_attempt_at = now + backoff(message.attempts + 1)
+            retry.append(message)
+        if error is not None:
+            message.attempts += 1
+            message.last_error = f'{type(error).__name__}: {error}'[:1000]
+            message.claim_token = ''
+
+    totals = {'sent': 0, 'retried': 0, 'dead': 0}
+    fields = ['status', 'attempts', 'next_attempt_at', 'last_error', 'claim_token']
+    for token, (sent, dead, retry) in claims.items():
+        held = OutboxMessage.objects.filter(claim_token=token, status='pending')
+        if sent:
+            totals['sent'] += held.filter(id__in=sent).update(
+                status='sent', sent_at=now, attempts=F('attempts') + 1, claim_token='', last_error=''
+            )
+        if dead:
+            totals['dead'] += held.bulk_update(dead, fields, batch_size=500)
+        if retry:
+            totals['retried'] += held.bulk_update(retry, fields, batch_size=500)
+    totals['stale'] = len(results) - sum(totals.values())
+    return totals
+
+
+def deliver_outbox(workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE, connection_kwargs=None, max_batches=None):
+    """
+    Drain every message that is due now, `batch_size` at a time.
+
+    Returns sent/retried/dead/stale counts plus elapsed seconds; messages
+    scheduled for a later retry are left for a future run.
+    """
+    totals = {'sent': 0, 'retried': 0, 'dead': 0, 'stale': 0, 'batches': 0}
+    deliverer = Deliverer(workers, connection_kwargs)
+    started = time.monotonic()
+    try:
+        while max_batches is None or totals['batches'] < max_batches:
+            messages = claim(batch_size)
+            if not messages:
+                break
+            for key, value in deliverer.deliver(messages).items():
+                totals[key] += value
+            totals['batches'] += 1
+    finally:
+        deliverer.close()
+    totals['elapsed'] = time.monotonic() - started
+    return totals
+
+
+def requeue_dead(queryset=None):
+    """Give dead-lettered messages a fresh set of attempts."""
+    queryset = OutboxMessage.objects.all() if queryset is None else queryset
+    return queryset.filter(status='dead').update(
+        status='pending', attempts=0, next_attempt_at=timezone.now(), claim_token=''
+    )
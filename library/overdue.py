@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+from django.db.models import Case, When, Value, CharField, Count, Sum, Min, Max, Q
+from django.utils import timezone
+
+from .models import Transaction
+from .versions import bump
+
+
+# (label, most whole days late in the bucket, or None for the rest)
+DAYS_LATE_BUCKETS = (
+    ('Up to 3 days', 3),
+    ('4-7 days', 7),
+    ('8-14 days', 14),
+    ('15-30 days', 30),
+    ('Over 30 days', None),
+)
+
+
+def _days_late_bucket(now):
+    # Buckets are ranges of due_date, so they are computed in SQL from the
+    # indexed column instead of per row in Python
+    whens = []
+    for label, most in DAYS_LATE_BUCKETS:
+        if most is None:
+            continue
+        whens.append(When(due_date__gt=now - timedelta(days=most + 1), then=Value(label)))
+    return Case(*whens, default=Value(DAYS_LATE_BUCKETS[-1][0]), output_field=CharField())
+
+
+def last_sweep(overdue):
+    """When flag_overdue last stamped one of the `overdue` loans, or None."""
+    return overdue.aggregate(last=Max('overdue_flagged_at'))['last']
+
+
+def newly_overdue(swept_at):
+    # Flagged by the latest sweep, or overdue since it and not yet flagged
+    condition = Q(overdue_flagged_at__isnull=True)
+    if swept_at is not None:
+        condition |= Q(overdue_flagged_at=swept_at)
+    return condition
+
+
+def overdue_summary(now=None):
+    """
+    Per-course and per-days-late aggregates of overdue loans, plus how many
+    are new since the last flag_overdue sweep.
+    """
+    now = now or timezone.now()
+    overdue = Transaction.objects.overdue(now)
+    swept_at = last_sweep(overdue)
+
+    by_days = {
+        row['bucket']: row
+        for row in overdue.annotate(bucket=_days_late_bucket(now)).values('bucket').annotate(
+            loans=Count('id'), items=Sum('open_item_count'), new=Count('id', filter=newly_overdue(swept_at))
+        ).order_by()
+    }
+    by_course = overdue.values('student__course').annotate(
+        loans=Count('id'),
+        items=Sum('open_item_count'),
+        oldest_due=Min('due_date')
+    ).order_by('-loans', 'student__course')
+
+    return {
+        'by_days_late': [
+            {'label': label, 'loans': by_days.get(label, {}).get('loans', 0), 'items': by_days.get(label, {}).get('items') or 0}
+            for label, _ in DAYS_LATE_BUCKETS
+        ],
+        'by_course': list(by_course),
+        'total_loans': sum(row['loans'] for row in by_days.values()),
+        'total_items': sum(row['items'] or 0 for row in by_days.values()),
+        'new_loans': sum(row['new'] for row in by_days.values()),
+        'last_sweep': swept_at,
+    }
+
+
+def flag_overdue(now=None):
+    """Stamp every loan that has become overdue since the last sweep, in one UPDATE."""
+    now = now or timezone.now()
+    flagged = Transaction.objects.overdue(now).filter(overdue_flagged_at__isnull=True).update(overdue_flagged_at=now)
+    if flagged:
+        bump('transactions')
+    return flagged
@@ -0,0 +1,161 @@
+import base64
+import json
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder cuts datetimes to milliseconds, which makes _seek
+    # skip or repeat rows whose sort keys differ by less than that
+    def default(self, o):
+        if isinstance(o, datetime):
+            return {'dt': o.isoformat()}
+        return super().default(o)
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _sort_field(queryset, name):
+    # A model field, or the output field of an annotation such as search_rank
+    try:
+        return queryset.model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return queryset.query.annotations[name].output_field
+
+
+def decode_cursor(cursor, ordering, queryset=None):
+    """
+    The sort key values in `cursor`, or None when it is not a cursor for
+    `ordering`. With `queryset`, each value is also converted by its
+    field's to_python(), so a tampered cursor is rejected here instead of
+    failing in the query.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            return None
+        values = [_decode_value(value) for value in values]
+        if queryset is not None:
+            values = [_sort_field(queryset, field.lstrip('-')).to_python(value) for field, value in zip(ordering, values)]
+    except (ValueError, TypeError, KeyError, ValidationError):
+        return None
+    if None in values:
+        return None
+    return values
+
+
+def _value(row, field):
+    name = field.lstrip('-')
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+def _seek(ordering, values, forward):
+    # (a, b, id) > (x, y, z) spelled out so every backend can use the index:
+    # a >= x AND (a > x OR (a = x AND b > y) OR (a = x AND b = y AND id > z))
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip('-')
+        descending = field.startswith('-')
+        lookup = 'lt' if descending == forward else 'gt'
+        term = Q(**{f'{name}__{lookup}': values[position]})
+        for previous, value in zip(ordering[:position], values[:position]):
+            term &= Q(**{previous.lstrip('-'): value})
+        condition |= term
+    first = ordering[0]
+    bound = 'lte' if first.startswith('-') == forward else 'gte'
+    return Q(**{f'{first.lstrip("-")}__{bound}': values[0]}) & condition
+
+
+def _flip(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+class KeysetPage:
+    def __init__(self, items, ordering, has_next, has_previous):
+        self.items = items
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = encode_cursor([_value(items[-1], f) for f in ordering]) if has_next and items else None
+        self.previous_cursor = encode_cursor([_value(items[0], f) for f in ordering]) if has_previous and items else None
+        self.next_query = ''
+        self.previous_query = ''
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def as_dict(self):
+        return {'next': self.next_cursor, 'previous': self.previous_cursor}
+
+
+def keyset_paginate(queryset, ordering, after=None, before=None, per_page=DEFAULT_PAGE_SIZE):
+    """
+    Return one page of `queryset` ordered by `ordering`, which must end in a
+    unique field (usually 'id') so ties are broken deterministically.
+
+    Pages are located with a WHERE on the last/first row's sort key instead
+    of OFFSET, so page 1000 costs the same index seek as page 1.
+    """
+    ordering = list(ordering)
+    after_values = decode_cursor(after, ordering, queryset) if after else None
+    before_values = decode_cursor(before, ordering, queryset) if before else None
+
+    if before_values is not None:
+        rows = list(
+            queryset.filter(_seek(ordering, before_values, forward=False))
+            .order_by(*[_flip(field) for field in ordering])[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        return KeysetPage(items, ordering, has_next=True, has_previous=has_previous)
+
+    if after_values is not None:
+        queryset = queryset.filter(_seek(ordering, after_values, forward=True))
+    rows = list(queryset.order_by(*ordering)[:per_page + 1])
+    return KeysetPage(rows[:per_page], ordering, has_next=len(rows) > per_page, has_previous=after_values is not None)
+
+
+def paginate_request(request, queryset, ordering, per_page=DEFAULT_PAGE_SIZE):
+    """keyset_paginate() driven by ?after= / ?before= / ?per_page= on the request."""
+    try:
+        per_page = max(1, min(int(request.GET.get('per_page', per_page)), MAX_PAGE_SIZE))
+    except ValueError:
+        pass
+
+    page = keyset_paginate(
+        queryset, ordering,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        per_page=per_page
+    )
+
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    if page.next_cursor:
+        params['after'] = page.next_cursor
+        page.next_query = params.urlencode()
+        params.pop('after')
+    if page.previous_cursor:
+        params['before'] = page.previous_cursor
+        page.previous_query = params.urlencode()
+    return page
@@ -0,0 +1,131 @@
+from django.db import transaction
+from django.db.models import Subquery
+
+from .models import TransactionItem, BookRecommendation
+from .versions import bump_on_commit
+
+
+TOP_N = 10
+
+
+def co_borrowing_neighbours(pairs, top_n=TOP_N):
+    """
+    Top `top_n` co-borrowed books for every book.
+
+    `pairs` is an (n, 2) integer array of (transaction_id, book_id). Two
+    books co-occur when they were borrowed in the same transaction; the
+    score is the cosine similarity of their borrow vectors,
+    co / sqrt(loans_a * loans_b), so a blockbuster does not top every list.
+    Returns parallel arrays (book_id, neighbour_id, rank, score, co_count)
+    sorted by book and rank. Everything is vectorized: the only Python loop
+    runs once per position within a transaction (i.e. up to the largest
+    cart size), not per row.
+    """
+    import numpy as np
+
+    pairs = np.unique(np.asarray(pairs, dtype=np.int64).reshape(-1, 2), axis=0)
+    empty = tuple(np.empty(0, dtype=dtype) for dtype in (np.int64, np.int64, np.int64, np.float64, np.int64))
+    if not len(pairs):
+        return empty
+
+    book_ids, books = np.unique(pairs[:, 1], return_inverse=True)
+    _, loans = np.unique(pairs[:, 0], return_inverse=True)
+    order = np.lexsort((books, loans))
+    loans, books = loans[order], books[order]
+    n_books = len(book_ids)
+    popularity = np.bincount(books, minlength=n_books)
+
+    # Rows of one transaction are contiguous, so comparing each row with
+    # the one `gap` positions later enumerates every same-loan pair once
+    firsts, seconds = [], []
+    for gap in range(1, int(np.bincount(loans).max())):
+        same = loans[:-gap] == loans[gap:]
+        firsts.append(books[:-gap][same])
+        seconds.append(books[gap:][same])
+    if not firsts:
+        return empty
+    first = np.concatenate(firsts)
+    second = np.concatenate(seconds)
+    if not len(first):
+        return empty
+
+    # Both directions, then count identical (a, b) keys: a sparse a x b matrix
+    keys, co_counts = np.unique(
+        np.concatenate([first * n_books + second, second * n_books + first]),
+        return_counts=True
+    )
+    a, b = keys // n_books, keys % n_books
+    scores = co_counts / np.sqrt(popularity[a].astype(np.float64) * popularity[b])
+
+    # Best first within each book (ties broken by co-count, then book id)
+    order = np.lexsort((book_ids[b], -co_counts, -scores, a))
+    a, b, scores, co_counts = a[order], b[order], scores[order], co_counts[order]
+    group_start = np.searchsorted(a, a, side='left')
+    ranks = np.arange(len(a)) - group_start
+    keep = ranks < top_n
+
+    return book_ids[a[keep]], book_ids[b[keep]], ranks[keep] + 1, scores[keep], co_counts[keep]
+
+
+def rebuild_recommendations(top_n=TOP_N, batch_size=5000):
+    """Recompute every book's neighbours from approved loans and replace the table."""
+    import numpy as np
+
+    pairs = np.fromiter(
+        (
+            value
+            for row in TransactionItem.objects.filter(
+                transaction__approval_status='approved'
+            ).values_list('transaction_id', 'book_id').order_by().iterator(chunk_size=batch_size)
+            for value in row
+        ),
+        dtype=np.int64
+    )
+    book_ids, neighbour_ids, ranks, scores, co_counts = co_borrowing_neighbours(pairs.reshape(-1, 2), top_n)
+
+    with transaction.atomic():
+        BookRecommendation.objects.all().delete()
+        BookRecommendation.objects.bulk_create(
+            (
+                BookRecommendation(book_id=book, recommended_id=neighbour, rank=rank, score=score, co_borrowed=count)
+                for book, neighbour, rank, score, count in zip(
+                    book_ids.tolist(), neighbour_ids.tolist(), ranks.tolist(), scores.tolist(), co_counts.tolist()
+                )
+            ),
+            batch_size=batch_size
+        )
+        bump_on_commit('recommendations')
+
+    return {'items': len(pairs) // 2, 'books': len(set(book_ids.tolist())), 'rows': len(book_ids)}
+
+
+def recommended_for_book(book_id, limit=TOP_N):
+    return [
+        rec.recommended for rec in
+        BookRecommendation.objects.filter(book_id=book_id, rank__lte=limit).select_related('recommended')
+    ]
+
+
+def recommended_for_student(student, limit=6, recent_items=20):
+    """
+    Books co-borrowed with the student's recent loans that they have not
+    borrowed themselves, best score first, in one query.
+    """
+    recent_books = TransactionItem.objects.filter(
+        transaction__student=student,
+        transaction__approval_status='approved'
+    ).order_by('-borrowed_date').values('book_id')[:recent_items]
+    borrowed = TransactionItem.objects.filter(transaction__student=student).values('book_id')
+
+    rows = BookRecommendation.objects.filter(
+        book_id__in=Subquery(recent_books)
+    ).exclude(
+        recommended_id__in=Subquery(borrowed)
+    ).select_related('recommended').order_by('-score', 'rank')[:limit * 3]
+
+    seen, books = set(), []
+    for row in rows:
+        if row.recommended_id not in seen:
+            seen.add(row.recommended_id)
+            books.append(row.recommended)
+    return books[:limit]
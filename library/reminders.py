@@ -0,0 +1,144 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+
+from .models import Transaction
+from .outbox import enqueue_many
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+# While a loan stays overdue it is reminded again this often
+OVERDUE_REPEAT = timedelta(days=7)
+
+# In the order they are sent: (stage, when it is due for a loan)
+STAGES = (
+    ('after_borrow', lambda loan: loan.borrowed_date + timedelta(days=2)),
+    ('before_due', lambda loan: loan.due_date - timedelta(days=1)),
+    ('overdue', lambda loan: loan.due_date + timedelta(days=1)),
+)
+STAGE_NAMES = [stage for stage, _ in STAGES]
+
+SUBJECTS = {
+    'after_borrow': 'Reminder: Return Your Borrowed Book',
+    'before_due': 'Reminder: Your Borrowed Book Is Due Tomorrow',
+    'overdue': 'Overdue: Please Return Your Borrowed Book',
+}
+OPENINGS = {
+    'after_borrow': 'This is a reminder that you borrowed the following book(s) 2 days ago:',
+    'before_due': 'This is a reminder that the following book(s) are due tomorrow:',
+    'overdue': 'The following book(s) are overdue:',
+}
+
+
+def first_reminder(loan):
+    """(stage, due time) to store on a loan when it is approved."""
+    stage, at = STAGES[0]
+    return stage, at(loan)
+
+
+def _due_at(loan, stage):
+    at = dict(STAGES)[stage](loan)
+    if stage == 'overdue' and loan.reminder_stage == 'overdue':
+        # Repeats are scheduled from the last send, not from the due date
+        at = max(at, loan.next_reminder_at)
+    return at
+
+
+def plan(loan, now):
+    """
+    Decide what a due loan gets at `now`: (stage to send or None, next
+    stage, its due time). When several stages have come due (the scheduler
+    was down, or the loan is short) only the latest is sent, so a catch-up
+    run never sends a burst of stale reminders.
+    """
+    if loan.status != 'borrowed' or loan.approval_status != 'approved':
+        return None, '', None
+
+    stages = STAGE_NAMES[STAGE_NAMES.index(loan.reminder_stage or STAGE_NAMES[0]):]
+    ready = [stage for stage in stages if _due_at(loan, stage) <= now]
+    if not ready:
+        # The dates moved (e.g. the due date was extended); wait for the new time
+        return None, stages[0], _due_at(loan, stages[0])
+
+    send = ready[-1]
+    if send == 'overdue':
+        return send, 'overdue', now + OVERDUE_REPEAT
+    following = STAGE_NAMES[STAGE_NAMES.index(send) + 1]
+    return send, following, _due_at(loan, following)
+
+
+def build_reminder(loan, stage):
+    books = '\n'.join(
+        f"- {item.book.title} by {item.book.author} (ISBN {item.book.isbn})"
+        for item in loan.items.all()
+        if item.status == 'borrowed'
+    )
+    message = f"""Dear {loan.student.get_full_name()},
+
+{OPENINGS[stage]}
+
+{books}
+
+Transaction Code: {loan.transaction_code}
+Due Date: {loan.due_date.strftime('%Y-%m-%d')}
+
+Please remember to return the book(s) by the due date.
+
+Thank you,
+Library Management System
+"""
+    return EmailMessage(SUBJECTS[stage], message, settings.DEFAULT_FROM_EMAIL, [loan.student.user.email])
+
+
+def run_due_reminders(now=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    One scheduler tick: pick up to `batch_size` loans whose next reminder
+    is due (one range query on txn_next_reminder_idx), queue their mail in
+    the outbox and advance their cursors, all in one transaction.
+
+    Returns the number of loans processed and reminders queued per stage.
+    """
+    now = now or timezone.now()
+    result = {'processed': 0, 'queued': dict.fromkeys(STAGE_NAMES, 0), 'skipped': 0}
+
+    with transaction.atomic():
+        loans = list(
+            Transaction.objects.select_for_update(of=('self',))
+            .filter(next_reminder_at__lte=now)
+            .select_related('student__user')
+            .order_by('next_reminder_at', 'id')[:batch_size]
+        )
+        if not loans:
+            return result
+        prefetch_related_objects(loans, 'items__book')
+
+        messages, unreachable = [], []
+        for loan in loans:
+            send, loan.reminder_stage, loan.next_reminder_at = plan(loan, now)
+            if send is None:
+                continue
+            user = loan.student.user
+            if user is None or not user.email:
+                # The cursor still moves on (holding it would block the batch
+                # every tick), so this reminder is only on record in the log
+                unreachable.append(loan.id)
+                continue
+            messages.append(build_reminder(loan, send))
+            loan.reminder_sent = True
+            result['queued'][send] += 1
+
+        if unreachable:
+            result['skipped'] = len(unreachable)
+            logger.warning('No email address for loan(s) %s; their reminders were skipped', unreachable)
+        enqueue_many(messages)
+        Transaction.objects.bulk_update(loans, ['reminder_stage', 'next_reminder_at', 'reminder_sent'], batch_size=500)
+
+    result['processed'] = len(loans)
+    return result
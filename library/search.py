@@ -0,0 +1,102 @@
+import re
+
+from django.db import connection
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .isbn import canonicalize_isbn
+from .models import Book
+
+
+FTS_TABLE = 'library_book_fts'
+# bm25 column weights: title, author, publisher, category, description
+FTS_WEIGHTS = (10.0, 6.0, 2.0, 2.0, 1.0)
+# Order (and keyset-paginate) ranked search_books() results by this
+RANKED_ORDERING = ('search_rank', 'id')
+# Digits, hyphens, spaces and the ISBN-10 check character X
+ISBN_LIKE = re.compile(r'[0-9Xx -]*[0-9][0-9Xx -]*')
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def build_match_query(text):
+    # Every word must match, each as a prefix ("harr pot" finds Harry Potter)
+    tokens = re.findall(r'\w+', text.lower())
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def isbn_filter(text):
+    """
+    Books whose canonical ISBN starts with the ISBN typed so far, or None
+    when `text` does not look like (part of) an ISBN. Each prefix is a range
+    on the unique canonical_isbn index, so it never scans the catalog.
+    """
+    if not ISBN_LIKE.fullmatch(text):
+        return None
+    prefix = canonicalize_isbn(text)
+    prefixes = {prefix}
+    if not prefix.startswith(('978', '979')):
+        # The start of an ISBN-10, stored as its ISBN-13
+        prefixes.add('978' + prefix)
+    match = Q()
+    for prefix in prefixes:
+        # Canonical ISBNs are [0-9A-Z], all of which sort below '~'
+        match |= Q(canonical_isbn__gte=prefix, canonical_isbn__lt=prefix + '~')
+    return match
+
+
+def _fts_join(queryset, match):
+    # MATCH runs once as the driving side of the join, and bm25 is read
+    # off the joined row instead of re-running the search per book
+    table = Book._meta.db_table
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match]
+    ).annotate(search_rank=RawSQL(f'bm25({FTS_TABLE}, {weights})', (), output_field=FloatField()))
+
+
+def search_books(text, queryset=None, ranked=True):
+    """
+    Filter `queryset` (all books by default) to those matching `text`.
+    Input that looks like an ISBN also matches by ISBN prefix. Ranked
+    results are annotated with search_rank and ordered by RANKED_ORDERING
+    (BM25 relevance, exact ISBN prefixes first), so they can be paged like
+    any other queryset; with `ranked` False the caller orders them.
+    Backends without FTS5 fall back to icontains, unranked.
+    """
+    queryset = Book.objects.all() if queryset is None else queryset
+    text = text.strip()
+    if not text:
+        return queryset
+
+    unranked = Value(0.0, output_field=FloatField())
+    isbn_match = isbn_filter(text)
+
+    if not fts_available():
+        matches = queryset.filter(
+            Q(title__icontains=text) | Q(author__icontains=text) | Q(isbn__icontains=text) |
+            (isbn_match or Q(canonical_isbn=canonicalize_isbn(text)))
+        )
+        return matches.annotate(search_rank=unranked).order_by(*RANKED_ORDERING) if ranked else matches
+
+    match = build_match_query(text)
+    if isbn_match is None:
+        if not match:
+            return queryset.none()
+        if ranked:
+            return _fts_join(queryset, match).order_by(*RANKED_ORDERING)
+        matching = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        return queryset.filter(id__in=matching)
+
+    # ISBN-shaped input: text hits (e.g. "1984") or ISBN prefix hits, each
+    # side an index lookup; the ISBN hits come first
+    matching = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+    matches = queryset.filter(Q(id__in=matching) | isbn_match)
+    if not ranked:
+        return matches
+    rank = Case(When(isbn_match, then=Value(-1.0)), default=unranked, output_field=FloatField())
+    return matches.annotate(search_rank=rank).order_by(*RANKED_ORDERING)
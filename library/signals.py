@@ -0,0 +1,116 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Book, Student, Transaction, TransactionItem
+from .cache import invalidate_isbns
+from .versions import bump_on_commit
+from .autocomplete import book_index
+from .student_search import index_student
+from . import counters
+from .circulation import refresh_item_counts
+from .loan_summary import refresh_loan_summaries_for_book, refresh_loan_summary, refresh_loan_summary_on_commit
+
+
+@receiver(pre_save, sender=Book)
+def remember_previous_isbn(sender, instance, **kwargs):
+    # An edited ISBN leaves the old cache key behind unless we drop it too;
+    # an edited title is copied into loan summaries
+    instance._previous_canonical_isbn = instance._previous_title = None
+    if instance.pk:
+        instance._previous_canonical_isbn, instance._previous_title = (
+            Book.objects.filter(pk=instance.pk).values_list('canonical_isbn', 'title').first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Book)
+def invalidate_book_cache_on_save(sender, instance, **kwargs):
+    invalidate_isbns({instance.canonical_isbn, getattr(instance, '_previous_canonical_isbn', None)})
+    bump_on_commit('books')
+    book_index.update_book(instance.id, instance.title, instance.author)
+
+
+@receiver(post_save, sender=Book)
+def refresh_summaries_on_rename(sender, instance, created, **kwargs):
+    if created or getattr(instance, '_previous_title', None) in (None, instance.title):
+        return
+    student_ids = refresh_loan_summaries_for_book(instance.id)
+    if student_ids:
+        bump_on_commit(*[f'student:{student_id}' for student_id in student_ids])
+
+
+@receiver(post_delete, sender=Book)
+def invalidate_book_cache_on_delete(sender, instance, **kwargs):
+    invalidate_isbns([instance.canonical_isbn])
+    bump_on_commit('books')
+    book_index.remove_book(instance.id)
+
+
+@receiver(post_save, sender=Student)
+def reindex_student(sender, instance, update_fields=None, **kwargs):
+    # Saves that only touch approval/verification flags leave the name alone
+    if update_fields is not None and not {'last_name', 'first_name', 'middle_name'} & set(update_fields):
+        return
+    index_student(instance)
+
+
+def _touches_counters(sender, update_fields):
+    return update_fields is None or bool(set(counters.COUNTED_FIELDS[sender]) & set(update_fields))
+
+
+@receiver(pre_save, sender=Student)
+@receiver(pre_save, sender=Book)
+@receiver(pre_save, sender=Transaction)
+def remember_counted_state(sender, instance, update_fields=None, **kwargs):
+    instance._stored_contribution = None
+    if _touches_counters(sender, update_fields):
+        instance._stored_contribution = counters.stored_contribution(instance)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Transaction)
+def adjust_counters_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if not _touches_counters(sender, update_fields):
+        return
+    stored = None if created else getattr(instance, '_stored_contribution', None)
+    counters.adjust(**counters.difference(counters.contribution(instance), stored))
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Transaction)
+def adjust_counters_on_delete(sender, instance, **kwargs):
+    counters.adjust(**{name: -value for name, value in counters.contribution(instance).items()})
+
+
+@receiver(post_save, sender=TransactionItem)
+@receiver(post_delete, sender=TransactionItem)
+def refresh_transaction_item_counts(sender, instance, **kwargs):
+    # Item edits outside circulation (admin inline, shell) keep the totals right
+    refresh_item_counts([instance.transaction_id])
+    student_id = Transaction.objects.filter(id=instance.transaction_id).values_list('student_id', flat=True).first()
+    if student_id is not None:
+        refresh_loan_summary_on_commit(student_id)
+    bump_on_commit('transactions', f'student:{student_id}')
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def bump_student_version(sender, instance, **kwargs):
+    bump_on_commit('students', f'student:{instance.id}')
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def bump_transaction_version(sender, instance, **kwargs):
+    bump_on_commit('transactions', f'student:{instance.student_id}')
+
+
+@receiver(post_save, sender=Transaction)
+def refresh_summary_on_save(sender, instance, **kwargs):
+    refresh_loan_summary(instance.student_id)
+
+
+@receiver(post_delete, sender=Transaction)
+def refresh_summary_on_delete(sender, instance, **kwargs):
+    refresh_loan_summary_on_commit(instance.student_id)
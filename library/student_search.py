@@ -0,0 +1,68 @@
+from django.db.models import Q
+
+from .models import Student, StudentSearchToken
+from .text import words, normalize_student_id
+
+
+# Upper bound for prefix ranges. Prefixes are matched as token >= p AND
+# token < p + MAX_CHAR rather than LIKE 'p%', which SQLite evaluates
+# case-insensitively and therefore cannot serve from a BINARY index.
+MAX_CHAR = '\U0010ffff'
+
+
+def student_tokens(student):
+    last = dict.fromkeys(words(student.last_name))
+    given = dict.fromkeys(words(f'{student.first_name} {student.middle_name}'))
+    return [('last', token) for token in last] + [('given', token) for token in given]
+
+
+def index_student(student):
+    StudentSearchToken.objects.filter(student=student).delete()
+    StudentSearchToken.objects.bulk_create([
+        StudentSearchToken(student=student, field=field, token=token[:100])
+        for field, token in student_tokens(student)
+    ])
+
+
+def _prefix(field, prefix):
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + MAX_CHAR})
+
+
+def _token_match(token, field=None):
+    tokens = StudentSearchToken.objects.filter(_prefix('token', token))
+    if field:
+        tokens = tokens.filter(field=field)
+    return Q(id__in=tokens.values('student_id'))
+
+
+def search_students(text, queryset=None):
+    """
+    Filter `queryset` (all students by default) to those matching `text`.
+
+    Every word must prefix-match a word of the student's name, ignoring case
+    and accents. "Last, First" input matches the part before the comma
+    against the last name and the rest against the first/middle names.
+    Input without a comma also matches student IDs by prefix, ignoring
+    dashes and spaces.
+    """
+    queryset = Student.objects.all() if queryset is None else queryset
+    text = text.strip()
+    if not text:
+        return queryset
+
+    if ',' in text:
+        last, given = text.split(',', 1)
+        condition = Q()
+        for token in words(last):
+            condition &= _token_match(token, 'last')
+        for token in words(given):
+            condition &= _token_match(token, 'given')
+        return queryset.filter(condition) if condition else queryset
+
+    tokens = words(text)
+    if not tokens:
+        return queryset.none()
+    name_match = Q()
+    for token in tokens:
+        name_match &= _token_match(token)
+    return queryset.filter(name_match | _prefix('search_id', normalize_student_id(text)))
@@ -1,3 +1,1213 @@
-from django.test import TestCase
+import io
+import json
+import smtplib
+import threading
+import time
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import caches
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .circulation import create_loan, return_items
+from .codes import NODE_LEASE, NodeLease, TransactionCodeGenerator, transaction_codes
+from .counters import COUNTER_QUERIES, read_counters
+from .autocomplete import PrefixIndex
+from .cart import CacheCartStore, PosCart
+from .cache import cache_stats, get_book_record, invalidate_books, reset_cache_stats
+from .facets import book_facets
+from .loan_summary import HISTORY_LENGTH
+from .fragments import fragment_stats, reset_fragment_stats
+from .outbox import BASE_DELAY, CLAIM_LEASE, claim, deliver_outbox, enqueue_email, record_results
+from .overdue import flag_overdue, overdue_summary
+from .reminders import OVERDUE_REPEAT, SUBJECTS, run_due_reminders
+from .pagination import encode_cursor, keyset_paginate
+from .search import FTS_TABLE, RANKED_ORDERING, search_books
+from .recommendations import co_borrowing_neighbours, rebuild_recommendations, recommended_for_student
+from .rollups import roll_up
+from .student_search import search_students
+from .inventory import InsufficientCopies, LoanAlreadyProcessed, approve_loan, return_copies, take_copies
+from .kiosk_sync import apply_operations
+from .isbn import canonicalize_isbn, is_valid_isbn10, is_valid_isbn13
+from .forms import BookForm
+from .models import (
+    KioskOperation,
+    User, Student, Book, Transaction, TransactionItem, StudentLoanSummary, OutboxMessage, PosCartRecord,
+    TransactionNodeLease, LibraryCounter,
+    DailyBookStat, DailyCategoryStat, DailyCohortStat
+)
+
+
+class CreateLoanTests(TestCase):
+    def setUp(self):
+        self.pos_user = User.objects.create_user(username='kiosk', password='pw', user_type='pos')
+        self.student = Student.objects.create(
+            student_id='2025-0001', last_name='Cruz', first_name='Ana',
+            course='BSIT', year='1', section='A', is_approved=True
+        )
+        self.books = [
+            Book.objects.create(isbn=f'TEST{i:04d}', title=f'Book {i}', author='Author', category='General')
+            for i in range(10)
+        ]
+        # Lease this process's node id up front so it is not counted below
+        transaction_codes.generate()
+
+    def _queries_for(self, books):
+        with CaptureQueriesContext(connection) as ctx:
+            create_loan(self.student, [book.id for book in books], self.pos_user)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        self.assertEqual(self._queries_for(self.books[:1]), self._queries_for(self.books))
+
+    def test_creates_one_item_per_book(self):
+        loan = create_loan(self.student, [book.id for book in self.books[:3]], self.pos_user)
+        self.assertEqual(loan.items.count(), 3)
+        self.assertEqual((loan.item_count, loan.open_item_count), (3, 3))
+        self.assertEqual(loan.approval_status, 'pending')
+
+    def test_unavailable_book_aborts_whole_checkout(self):
+        Book.objects.filter(id=self.books[1].id).update(copies_available=0)
+        with self.assertRaises(InsufficientCopies) as ctx:
+            create_loan(self.student, [book.id for book in self.books[:3]], self.pos_user)
+        self.assertEqual([book.id for book in ctx.exception.books], [self.books[1].id])
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(TransactionItem.objects.exists())
+
+
+class ReturnItemsTests(TestCase):
+    def setUp(self):
+        self.student = Student.objects.create(
+            student_id='2025-0002', last_name='Reyes', first_name='Ben',
+            course='BSCS', year='2', section='B', is_approved=True
+        )
+        self.books = [
+            Book.objects.create(isbn=f'RET{i:04d}', title=f'Book {i}', author='Author', category='General', copies_available=0)
+            for i in range(6)
+        ]
+        self.loans = []
+        for chunk in (self.books[:3], self.books[3:]):
+            loan = Transaction.objects.create(
+                student=self.student, transaction_code=Transaction.generate_transaction_code(),
+                due_date=timezone.now(), approval_status='approved',
+                item_count=len(chunk), open_item_count=len(chunk)
+            )
+            TransactionItem.objects.bulk_create([TransactionItem(transaction=loan, book=book) for book in chunk])
+            self.loans.append(loan)
+
+    def _item_ids(self, books):
+        return list(TransactionItem.objects.filter(book__in=books).values_list('id', flat=True))
+
+    def test_query_count_does_not_grow_with_item_count(self):
+        with CaptureQueriesContext(connection) as one:
+            return_items(self.student, self._item_ids(self.books[:1]))
+        with CaptureQueriesContext(connection) as many:
+            return_items(self.student, self._item_ids(self.books[1:]))
+        self.assertEqual(len(one.captured_queries), len(many.captured_queries))
+
+    def test_closes_only_fully_returned_transactions(self):
+        returned = return_items(self.student, self._item_ids(self.books[:4]))
+        self.assertEqual(len(returned), 4)
+        self.assertEqual(
+            list(Book.objects.filter(id__in=[b.id for b in self.books[:4]]).values_list('copies_available', flat=True)),
+            [1, 1, 1, 1]
+        )
+        first, second = (Transaction.objects.get(id=loan.id) for loan in self.loans)
+        self.assertEqual(first.status, 'returned')
+        self.assertEqual(second.status, 'borrowed')
+
+    def test_maintains_open_item_counts(self):
+        return_items(self.student, self._item_ids(self.books[:4]))
+        first, second = (Transaction.objects.get(id=loan.id) for loan in self.loans)
+        self.assertEqual((first.item_count, first.open_item_count), (3, 0))
+        self.assertEqual((second.item_count, second.open_item_count), (3, 2))
+
+    def test_pending_items_are_not_returned(self):
+        Transaction.objects.filter(id=self.loans[0].id).update(approval_status='pending')
+        self.assertEqual(return_items(self.student, self._item_ids(self.books[:3])), [])
+        self.assertFalse(Book.objects.filter(copies_available__gt=0).exists())
+
+
+class TransactionCodeGeneratorTests(SimpleTestCase):
+    def test_no_collisions_across_threads_and_nodes(self):
+        nodes = [TransactionCodeGenerator(node_id=1), TransactionCodeGenerator(node_id=2)]
+        per_thread = 5000
+        results = []
+
+        def worker(generator):
+            codes = [generator.generate() for _ in range(per_thread)]
+            results.append(codes)
+
+        threads = [threading.Thread(target=worker, args=(nodes[i % 2],)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        all_codes = [code for codes in results for code in codes]
+        self.assertEqual(len(all_codes), 8 * per_thread)
+        self.assertEqual(len(set(all_codes)), len(all_codes))
+
+    def test_codes_from_one_node_are_time_ordered(self):
+        generator = TransactionCodeGenerator(node_id=7)
+        codes = [generator.generate() for _ in range(3000)]
+        self.assertEqual(codes, sorted(codes))
+        self.assertTrue(all(code.startswith('ISU') and len(code) == 27 for code in codes))
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        for i in range(23):
+            Book.objects.create(isbn=f'PAGE{i:04d}', title=f'Title {i % 4}', author='Author', category='General')
+
+    def _walk_forward(self, ordering):
+        ids, after = [], None
+        while True:
+            page = keyset_paginate(Book.objects.all(), ordering, after=after, per_page=5)
+            ids += [book.id for book in page]
+            if not page.has_next:
+                return ids, page
+            after = page.next_cursor
+
+    def test_pages_cover_every_row_once_in_order(self):
+        for ordering in (('title', 'id'), ('-title', '-id'), ('title', '-id')):
+            ids, _ = self._walk_forward(ordering)
+            self.assertEqual(ids, list(Book.objects.order_by(*ordering).values_list('id', flat=True)))
+
+    def test_previous_cursor_walks_back_to_the_start(self):
+        ids, page = self._walk_forward(('title', 'id'))
+        walked_back = [book.id for book in page]
+        while page.previous_cursor:
+            page = keyset_paginate(Book.objects.all(), ('title', 'id'), before=page.previous_cursor, per_page=5)
+            walked_back = [book.id for book in page] + walked_back
+        self.assertEqual(walked_back, ids)
+
+    def test_tampered_cursor_falls_back_to_the_first_page(self):
+        first = keyset_paginate(Book.objects.all(), ('title', 'id'), per_page=5)
+        for values in (['a', 'abc'], ['a', None], [{'dt': 1}, 1]):
+            page = keyset_paginate(Book.objects.all(), ('title', 'id'), after=encode_cursor(values), per_page=5)
+            self.assertEqual([book.id for book in page], [book.id for book in first])
+        page = keyset_paginate(Transaction.objects.all(), ('-borrowed_date', '-id'), before=encode_cursor(['x', 1]))
+        self.assertEqual(list(page), [])
+
+    def test_datetime_cursor_keeps_microseconds(self):
+        base = timezone.now().replace(microsecond=123000)
+        for offset in (400, 200, 300):
+            OutboxMessage.objects.create(subject='s', body='b', next_attempt_at=base + timezone.timedelta(microseconds=offset))
+        for ordering in (('-next_attempt_at', '-id'), ('next_attempt_at', 'id')):
+            ids, after = [], None
+            while True:
+                page = keyset_paginate(OutboxMessage.objects.all(), ordering, after=after, per_page=1)
+                ids += [message.id for message in page]
+                if not page.has_next:
+                    break
+                after = page.next_cursor
+            self.assertEqual(ids, list(OutboxMessage.objects.order_by(*ordering).values_list('id', flat=True)))
+
+
+class StudentSearchTests(TestCase):
+    def setUp(self):
+        def student(student_id, last_name, first_name, middle_name=''):
+            return Student.objects.create(
+                student_id=student_id, last_name=last_name, first_name=first_name,
+                middle_name=middle_name, course='BSIT', year='1', section='A'
+            )
+        self.pena = student('2025-0001', 'Peña', 'José', 'Luis')
+        self.cruz = student('2025-0102', 'Dela Cruz', 'Ana')
+        self.luis = student('2024-0001', 'Luis', 'Marco')
+
+    def ids(self, text):
+        return set(search_students(text).values_list('id', flat=True))
+
+    def test_name_tokens_ignore_case_and_accents(self):
+        self.assertEqual(self.ids('pena'), {self.pena.id})
+        self.assertEqual(self.ids('JOSE PEN'), {self.pena.id})
+        self.assertEqual(self.ids('cruz'), {self.cruz.id})
+        self.assertEqual(self.ids('luis'), {self.pena.id, self.luis.id})
+
+    def test_last_comma_first(self):
+        self.assertEqual(self.ids('Luis, Marco'), {self.luis.id})
+        self.assertEqual(self.ids('peña, luis'), {self.pena.id})
+        self.assertEqual(self.ids('dela cruz, a'), {self.cruz.id})
+        self.assertEqual(self.ids('marco, luis'), set())
+
+    def test_student_id_prefix(self):
+        self.assertEqual(self.ids('2025-0'), {self.pena.id, self.cruz.id})
+        self.assertEqual(self.ids('20250102'), {self.cruz.id})
+
+    def test_renaming_reindexes(self):
+        self.cruz.last_name = 'Santos'
+        self.cruz.save()
+        self.assertEqual(self.ids('cruz'), set())
+        self.assertEqual(self.ids('santos, ana'), {self.cruz.id})
+
+
+class BookFacetTests(TestCase):
+    def setUp(self):
+        for alias in caches:
+            caches[alias].clear()
+        Book.objects.create(isbn='9780000000101', title='Physics Today', author='A', category='Science',
+                            year_published=1994, copies_available=1)
+        Book.objects.create(isbn='9780000000102', title='Chemistry Basics', author='B', category='Science',
+                            year_published=2003, copies_available=0)
+        self.novel = Book.objects.create(isbn='9780000000103', title='Physics of Love', author='C',
+                                         category='Fiction', year_published=2008, copies_available=2)
+
+    def test_counts_in_one_query_then_cached(self):
+        with CaptureQueriesContext(connection) as queries:
+            facets = book_facets()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(facets['total'], 3)
+        self.assertEqual(facets['categories'], [{'value': 'Fiction', 'count': 1}, {'value': 'Science', 'count': 2}])
+        self.assertEqual([a['count'] for a in facets['availability']], [2, 1])
+        self.assertEqual([(d['value'], d['count']) for d in facets['decades']], [(2000, 2), (1990, 1)])
+
+        with self.assertNumQueries(0):
+            book_facets()
+
+    def test_search_facets_and_invalidation(self):
+        facets = book_facets('physics')
+        self.assertEqual(facets['total'], 2)
+
+        self.novel.category = 'Science'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.novel.save()
+        facets = book_facets('physics')
+        self.assertEqual(facets['categories'], [{'value': 'Science', 'count': 2}])
+
+
+class LibraryCounterTests(TestCase):
+    def assertCountersAccurate(self):
+        with self.assertNumQueries(1):
+            counts = read_counters()
+        self.assertEqual(counts, {name: query().count() for name, query in COUNTER_QUERIES.items()})
+
+    def test_counters_follow_circulation(self):
+        admin = User.objects.create_user(username='admin', password='pw', user_type='admin')
+        user = User.objects.create_user(username='2025-0100', password='pw', user_type='student')
+        student = Student.objects.create(
+            user=user, student_id='2025-0100', last_name='Lim', first_name='Kai',
+            course='BSIT', year='1', section='A'
+        )
+        books = [
+            Book.objects.create(isbn=f'CNT{i:04d}', title=f'Book {i}', author='Author', category='General')
+            for i in range(3)
+        ]
+        self.assertCountersAccurate()
+
+        student.is_approved = True
+        student.save()
+        first = create_loan(student, [books[0].id, books[1].id], admin)
+        second = create_loan(student, [books[2].id], admin)
+        self.assertCountersAccurate()
+
+        approve_loan(first, admin)
+        second.approval_status = 'rejected'
+        second.save()
+        self.assertCountersAccurate()
+
+        return_items(student, first.items.filter(book=books[0]).values_list('id', flat=True))
+        self.assertCountersAccurate()
+        return_items(student, first.items.values_list('id', flat=True))
+        self.assertCountersAccurate()
+
+        books[2].delete()
+        user.delete()
+        self.assertCountersAccurate()
+
+
+class DashboardFragmentTests(TestCase):
+    def setUp(self):
+        for alias in caches:
+            caches[alias].clear()
+        reset_fragment_stats()
+        self.admin = User.objects.create_user(username='admin', password='pw', user_type='admin')
+        self.student = Student.objects.create(
+            student_id='2025-0200', last_name='Tan', first_name='Mia',
+            course='BSIT', year='1', section='A', is_approved=True
+        )
+        self.book = Book.objects.create(isbn='FRAG0001', title='Cached Panels', author='A', category='General')
+        self.client.force_login(self.admin)
+
+    def test_panels_are_served_from_cache_until_a_write(self):
+        url = '/admin/dashboard/'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as warm:
+            response = self.client.get(url)
+        self.assertNotContains(response, 'Pending Book Borrowing')
+        self.assertEqual(fragment_stats()['admin_recent_transactions'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+        self.assertFalse(any('library_transaction' in query['sql'] for query in warm.captured_queries))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_loan(self.student, [self.book.id], self.admin)
+        response = self.client.get(url)
+        self.assertContains(response, 'Pending Book Borrowing')
+        self.assertEqual(fragment_stats()['admin_quick_actions']['misses'], 2)
+
+    def test_reconcile_refreshes_cached_counter_panels(self):
+        url = '/admin/dashboard/'
+        self.client.get(url)
+        LibraryCounter.objects.filter(name='books').update(value=999)
+        self.client.get(url)
+        self.assertEqual(fragment_stats()['admin_stat_cards']['hits'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('reconcile_counters', stdout=io.StringIO())
+        self.client.get(url)
+        self.assertEqual(fragment_stats()['admin_stat_cards']['misses'], 2)
+
+
+class StudentLoanSummaryTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='pw', user_type='admin')
+        self.student = Student.objects.create(
+            student_id='2025-0300', last_name='Go', first_name='Lea',
+            course='BSIT', year='1', section='A', is_approved=True
+        )
+        self.books = [
+            Book.objects.create(isbn=f'SUM{i:04d}', title=f'Book {i}', author='Author', category='General', copies_available=9)
+            for i in range(3)
+        ]
+
+    def summary(self):
+        return StudentLoanSummary.objects.get(student=self.student)
+
+    def test_follows_borrow_approve_and_return(self):
+        loan = create_loan(self.student, [book.id for book in self.books[:2]], self.admin)
+        self.assertEqual((self.summary().pending_loan_count, self.summary().open_loan_count), (1, 0))
+
+        approve_loan(loan, self.admin)
+        summary = self.summary()
+        self.assertEqual((summary.pending_loan_count, summary.open_loan_count, summary.open_item_count), (0, 1, 2))
+        self.assertEqual(summary.next_due_date, Transaction.objects.get(id=loan.id).due_date)
+        self.assertEqual(summary.get_open_loans()[0]['titles'], ['Book 0', 'Book 1'])
+        self.assertEqual(summary.get_history()[0]['transaction_code'], loan.transaction_code)
+
+        Transaction.objects.filter(id=loan.id).update(due_date=timezone.now() - timezone.timedelta(days=1))
+        self.assertEqual(self.summary().overdue_count(), 0)
+        return_items(self.student, loan.items.filter(book=self.books[0]).values_list('id', flat=True))
+        summary = self.summary()
+        self.assertEqual((summary.open_loan_count, summary.open_item_count, summary.overdue_count()), (1, 1, 1))
+
+        return_items(self.student, loan.items.values_list('id', flat=True))
+        summary = self.summary()
+        self.assertEqual((summary.open_loan_count, summary.next_due_date), (0, None))
+        self.assertEqual(summary.get_history()[0]['status'], 'returned')
+
+    def test_history_keeps_latest_entries(self):
+        for _ in range(HISTORY_LENGTH + 2):
+            approve_loan(create_loan(self.student, [self.books[2].id], self.admin), self.admin)
+        history = self.summary().get_history()
+        self.assertEqual(len(history), HISTORY_LENGTH)
+        self.assertEqual(history[0]['transaction_code'], Transaction.objects.latest('borrowed_date', 'id').transaction_code)
+
+    def test_renaming_a_borrowed_book_updates_the_summary(self):
+        loan = create_loan(self.student, [self.books[0].id], self.admin)
+        approve_loan(loan, self.admin)
+        self.books[0].title = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.books[0].save()
+        self.assertEqual(self.summary().get_open_loans()[0]['titles'], ['Renamed'])
+
+
+class CirculationRollupTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='pw', user_type='admin')
+        self.students = [
+            Student.objects.create(
+                student_id=f'2025-04{i:02d}', last_name='Uy', first_name=f'S{i}',
+                course=course, year='1', section='A', is_approved=True
+            )
+            for i, course in enumerate(['BSIT', 'BSIT', 'BSED'])
+        ]
+        self.science = Book.objects.create(isbn='ROLL0001', title='Atoms', author='A', category='Science', copies_available=9)
+        self.fiction = Book.objects.create(isbn='ROLL0002', title='Tales', author='B', category='Fiction', copies_available=9)
+
+    def borrow(self, student, *books):
+        loan = create_loan(student, [book.id for book in books], self.admin)
+        approve_loan(loan, self.admin)
+        return loan
+
+    def test_incremental_runs_count_each_event_once(self):
+        first = self.borrow(self.students[0], self.science, self.fiction)
+        self.borrow(self.students[2], self.science)
+        result = roll_up(lag=timezone.timedelta(0))
+        self.assertEqual((result['loans'], result['returns']), (3, 0))
+
+        return_items(self.students[0], first.items.values_list('id', flat=True))
+        self.borrow(self.students[1], self.science)
+        result = roll_up(lag=timezone.timedelta(0))
+        self.assertEqual((result['loans'], result['returns']), (1, 2))
+        self.assertEqual(roll_up(lag=timezone.timedelta(0))['loans'], 0)
+
+        today = timezone.localdate()
+        self.assertEqual(DailyBookStat.objects.get(day=today, book=self.science).loans, 3)
+        self.assertEqual(
+            dict(DailyCategoryStat.objects.filter(day=today).values_list('category', 'returns')),
+            {'Science': 1, 'Fiction': 1}
+        )
+        self.assertEqual(
+            dict(DailyCohortStat.objects.filter(day=today).values_list('course', 'loans')),
+            {'BSIT': 3, 'BSED': 1}
+        )
+
+    def test_analytics_page_reads_rollups(self):
+        self.borrow(self.students[0], self.science)
+        roll_up(lag=timezone.timedelta(0))
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/analytics/?period=day')
+        self.assertContains(response, 'Atoms')
+        self.assertFalse(any('library_transaction' in query['sql'] for query in queries.captured_queries))
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipUnless(numpy, 'NumPy is not installed')
+class RecommendationTests(TestCase):
+    def test_neighbours_ranked_by_cosine_similarity(self):
+        # Book 1 shares two loans with book 2, one with book 3; book 4 is
+        # borrowed with 1 once but is very popular
+        pairs = [(1, 1), (1, 2), (2, 1), (2, 2), (3, 1), (3, 3), (4, 1), (4, 4)]
+        pairs += [(100 + i, 4) for i in range(20)]
+        books, neighbours, ranks, scores, counts = co_borrowing_neighbours(pairs, top_n=2)
+        first = books == 1
+        self.assertEqual(neighbours[first].tolist(), [2, 3])
+        self.assertEqual(ranks[first].tolist(), [1, 2])
+        self.assertEqual(counts[first].tolist(), [2, 1])
+
+    def test_dashboard_recommendations_skip_books_already_borrowed(self):
+        admin = User.objects.create_user(username='admin', password='pw', user_type='admin')
+        readers = [
+            Student.objects.create(
+                student_id=f'2025-05{i:02d}', last_name='Sy', first_name=f'R{i}',
+                course='BSIT', year='1', section='A', is_approved=True
+            )
+            for i in range(3)
+        ]
+        books = [
+            Book.objects.create(isbn=f'REC{i:04d}', title=f'Book {i}', author='A', category='General', copies_available=9)
+            for i in range(4)
+        ]
+        for reader, picks in ((readers[0], [0, 1, 2]), (readers[1], [0, 2]), (readers[2], [0])):
+            approve_loan(create_loan(reader, [books[i].id for i in picks], admin), admin)
+
+        rebuild_recommendations()
+        with self.assertNumQueries(1):
+            suggested = recommended_for_student(readers[2])
+        self.assertEqual([book.id for book in suggested], [books[2].id, books[1].id])
+
+
+class OverdueTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.loans = []
+        for i, (course, days_late) in enumerate([('BSIT', 2), ('BSIT', 10), ('BSED', 45), ('BSED', -3)]):
+            student = Student.objects.create(
+                student_id=f'2025-06{i:02d}', last_name='Ong', first_name=f'O{i}',
+                course=course, year='1', section='A', is_approved=True
+            )
+            self.loans.append(Transaction.objects.create(
+                student=student, transaction_code=Transaction.generate_transaction_code(),
+                due_date=self.now - timezone.timedelta(days=days_late, hours=1),
+                approval_status='approved', item_count=2, open_item_count=2
+            ))
+        Transaction.objects.filter(id=self.loans[0].id).update(status='returned')
+
+    def test_summary_aggregates(self):
+        summary = overdue_summary(self.now)
+        self.assertEqual(summary['total_loans'], 2)
+        self.assertEqual(
+            {bucket['label']: bucket['loans'] for bucket in summary['by_days_late'] if bucket['loans']},
+            {'8-14 days': 1, 'Over 30 days': 1}
+        )
+        self.assertEqual([(row['student__course'], row['loans']) for row in summary['by_course']], [('BSED', 1), ('BSIT', 1)])
+
+    def test_sweep_flags_each_loan_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(flag_overdue(self.now), 2)
+        self.assertEqual(flag_overdue(self.now), 0)
+        self.assertEqual(
+            set(Transaction.objects.exclude(overdue_flagged_at=None).values_list('id', flat=True)),
+            {self.loans[1].id, self.loans[2].id}
+        )
+
+    def test_report_marks_loans_new_since_the_last_sweep(self):
+        flag_overdue(self.now - timezone.timedelta(days=20))
+        flag_overdue(self.now)
+        summary = overdue_summary(self.now)
+        self.assertEqual((summary['last_sweep'], summary['new_loans']), (self.now, 1))
+
+        self.client.force_login(User.objects.create_user(username='admin', password='pw', user_type='admin'))
+        response = self.client.get('/admin/transactions/overdue/', {'new': '1'})
+        self.assertEqual([loan.id for loan in response.context['loans']], [self.loans[1].id])
+
+    def test_report_query_count_is_constant(self):
+        admin = User.objects.create_user(username='admin', password='pw', user_type='admin')
+        self.client.force_login(admin)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get('/admin/transactions/overdue/')
+        student = Student.objects.get(student_id='2025-0603')
+        for _ in range(5):
+            Transaction.objects.create(
+                student=student, transaction_code=Transaction.generate_transaction_code(),
+                due_date=self.now - timezone.timedelta(days=1), approval_status='approved'
+            )
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get('/admin/transactions/overdue/')
+        self.assertContains(response, student.student_id)
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+
+class SendRemindersTests(TestCase):
+    def setUp(self):
+        admin = User.objects.create_user(username='admin', password='pw', user_type='admin')
+        book = Book.objects.create(isbn='REM0001', title='Noli Me Tangere', author='Rizal', category='General', copies_available=9)
+        borrowed = timezone.now() - timezone.timedelta(days=2)
+        for i in range(5):
+            student = Student.objects.create(
+                user=User.objects.create_user(username=f'reader{i}', password='pw', email=f'reader{i}@example.com'),
+                student_id=f'2025-07{i:02d}', last_name='Tan', first_name=f'T{i}',
+                course='BSIT', year='1', section='A', is_approved=True
+            )
+            loan = create_loan(student, [book.id], admin)
+            approve_loan(loan, admin)
+            Transaction.objects.filter(id=loan.id).update(borrowed_date=borrowed, next_reminder_at=borrowed + timezone.timedelta(days=2))
+
+    def test_queues_each_batch_with_one_update(self):
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('send_reminders', batch_size=2, stdout=io.StringIO())
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutboxMessage.objects.filter(status='pending').count(), 5)
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 3)
+        self.assertFalse(Transaction.objects.filter(reminder_sent=False).exists())
+
+        call_command('send_reminders', stdout=io.StringIO())
+        self.assertEqual(OutboxMessage.objects.count(), 5)
+        self.assertEqual(set(Transaction.objects.values_list('reminder_stage', flat=True)), {'before_due'})
+
+        call_command('deliver_outbox', workers=3, batch_size=2, stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertIn('Noli Me Tangere', mail.outbox[0].body)
+        self.assertFalse(OutboxMessage.objects.exclude(status='sent').exists())
+
+    def test_failed_reminders_are_sent_by_a_later_run(self):
+        call_command('send_reminders', stdout=io.StringIO())
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=smtplib.SMTPServerDisconnected('Connection unexpectedly closed')):
+            call_command('deliver_outbox', stdout=io.StringIO())
+        self.assertEqual(OutboxMessage.objects.filter(status='pending', attempts=1).count(), 5)
+
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        call_command('deliver_outbox', stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(OutboxMessage.objects.exclude(status='sent').exists())
+
+
+class FlakyBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            if message.to[0].startswith('bounce'):
+                raise smtplib.SMTPRecipientsRefused({message.to[0]: (550, b'No such user')})
+            if message.to[0].startswith('flaky'):
+                raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+            mail.outbox.append(message)
+        return len(email_messages)
+
+
+class OutboxTests(TestCase):
+    def test_transient_failures_back_off_and_permanent_ones_dead_letter(self):
+        for address in ('ok@example.com', 'bounce@example.com', 'flaky@example.com'):
+            enqueue_email('Hello', 'Body', [address])
+
+        result = deliver_outbox(workers=2, connection_kwargs={'backend': 'library.tests.FlakyBackend'})
+        self.assertEqual((result['sent'], result['retried'], result['dead']), (1, 1, 1))
+        self.assertEqual([message.to for message in mail.outbox], [['ok@example.com']])
+
+        flaky = OutboxMessage.objects.get(to=['flaky@example.com'])
+        self.assertEqual((flaky.status, flaky.attempts), ('pending', 1))
+        self.assertGreater(flaky.next_attempt_at, timezone.now() + BASE_DELAY * 0.8)
+        self.assertIn('SMTPServerDisconnected', flaky.last_error)
+        self.assertEqual(OutboxMessage.objects.get(to=['bounce@example.com']).status, 'dead')
+
+        # Not due yet, so a second run leaves it alone
+        self.assertEqual(deliver_outbox(connection_kwargs={'backend': 'library.tests.FlakyBackend'})['batches'], 0)
+
+    def test_claimed_messages_are_hidden_from_other_workers(self):
+        for i in range(3):
+            enqueue_email('Hello', 'Body', [f'user{i}@example.com'])
+        self.assertEqual(len(claim(2)), 2)
+        self.assertEqual(len(claim(5)), 1)
+        self.assertEqual(claim(5), [])
+
+    def test_results_under_an_expired_claim_are_dropped(self):
+        enqueue_email('Hello', 'Body', ['slow@example.com'])
+        slow, = claim(1)
+        # The lease runs out mid-send and another worker takes the message
+        taken, = claim(1, now=timezone.now() + CLAIM_LEASE * 2)
+
+        result = record_results([(slow, None)])
+        self.assertEqual((result['sent'], result['stale']), (0, 1))
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.status, message.claim_token), ('pending', taken.claim_token))
+
+        result = record_results([(taken, smtplib.SMTPServerDisconnected('gone'))])
+        self.assertEqual((result['retried'], result['stale']), (1, 0))
+
+
+class ReminderSchedulerTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='pw', user_type='admin')
+        self.book = Book.objects.create(isbn='SCH0001', title='El Filibusterismo', author='Rizal', category='General', copies_available=9)
+        self.student = Student.objects.create(
+            user=User.objects.create_user(username='reader', password='pw', email='reader@example.com'),
+            student_id='2025-0800', last_name='Lim', first_name='L',
+            course='BSIT', year='1', section='A', is_approved=True
+        )
+        self.loan = create_loan(self.student, [self.book.id], self.admin)
+        approve_loan(self.loan, self.admin)
+        self.loan.refresh_from_db()
+
+    def test_stages_follow_the_loan(self):
+        self.assertEqual(self.loan.reminder_stage, 'after_borrow')
+        self.assertEqual(run_due_reminders(self.loan.borrowed_date + timezone.timedelta(days=1))['processed'], 0)
+
+        run_due_reminders(self.loan.next_reminder_at)
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.reminder_stage, 'before_due')
+        self.assertEqual(self.loan.next_reminder_at, self.loan.due_date - timezone.timedelta(days=1))
+
+        result = run_due_reminders(self.loan.next_reminder_at)
+        self.assertEqual(result['queued']['before_due'], 1)
+        self.assertEqual(
+            list(OutboxMessage.objects.order_by('id').values_list('subject', flat=True)),
+            [SUBJECTS['after_borrow'], SUBJECTS['before_due']]
+        )
+
+    def test_catch_up_sends_only_the_latest_stage(self):
+        now = self.loan.due_date + timezone.timedelta(days=3)
+        result = run_due_reminders(now)
+        self.assertEqual(result['queued'], {'after_borrow': 0, 'before_due': 0, 'overdue': 1})
+        self.loan.refresh_from_db()
+        self.assertEqual((self.loan.reminder_stage, self.loan.next_reminder_at), ('overdue', now + OVERDUE_REPEAT))
+        self.assertEqual(run_due_reminders(now + timezone.timedelta(days=1))['processed'], 0)
+        self.assertEqual(run_due_reminders(now + OVERDUE_REPEAT)['queued']['overdue'], 1)
+
+    def test_returned_loan_leaves_the_schedule(self):
+        return_items(self.student, list(self.loan.items.values_list('id', flat=True)))
+        self.loan.refresh_from_db()
+        self.assertIsNone(self.loan.next_reminder_at)
+        self.assertEqual(run_due_reminders(self.loan.due_date + timezone.timedelta(days=30))['processed'], 0)
+
+    def test_loans_without_an_email_are_logged(self):
+        User.objects.filter(id=self.student.user_id).update(email='')
+        with self.assertLogs('library.reminders', 'WARNING') as logs:
+            result = run_due_reminders(self.loan.next_reminder_at)
+        self.assertEqual((result['skipped'], OutboxMessage.objects.count()), (1, 0))
+        self.assertIn(str(self.loan.id), logs.output[0])
+
+
+class IsbnTests(TestCase):
+    def test_isbn10_checksum(self):
+        self.assertTrue(is_valid_isbn10('0306406152'))
+        self.assertTrue(is_valid_isbn10('080442957X'))
+        self.assertFalse(is_valid_isbn10('0306406153'))
+
+    def test_isbn13_checksum(self):
+        self.assertTrue(is_valid_isbn13('9780306406157'))
+        self.assertFalse(is_valid_isbn13('9780306406158'))
+        self.assertFalse(is_valid_isbn13('1234567890123'))
+
+    def test_isbn10_and_isbn13_share_a_canonical_key(self):
+        self.assertEqual(canonicalize_isbn('0-306-40615-2'), '9780306406157')
+        self.assertEqual(canonicalize_isbn('978-0-306-40615-7'), '9780306406157')
+        self.assertEqual(canonicalize_isbn('lib-00042'), 'LIB00042')
+
+    def test_lookup_by_any_spelling_of_the_isbn(self):
+        book = Book.objects.create(isbn='0-306-40615-2', title='Signals', author='A', category='General')
+        self.assertEqual(Book.objects.find_by_isbn('9780306406157'), book)
+        self.assertEqual(Book.objects.find_by_isbn('0306406152'), book)
+        self.assertIsNone(Book.objects.find_by_isbn('9780306406158'))
+
+    def test_form_rejects_bad_isbn13_check_digit(self):
+        data = {'title': 'T', 'author': 'A', 'category': 'General', 'copies_total': 1}
+        self.assertFalse(BookForm(data={**data, 'isbn': '978-0-306-40615-8'}).is_valid())
+        self.assertTrue(BookForm(data={**data, 'isbn': '978-0-306-40615-7'}).is_valid())
+        self.assertTrue(BookForm(data={**data, 'isbn': 'LIB-00042'}).is_valid())
+
+    def test_form_rejects_another_spelling_of_an_existing_isbn(self):
+        book = Book.objects.create(isbn='9780306406157', title='Signals', author='A', category='General')
+        data = {'title': 'T', 'author': 'A', 'category': 'General', 'copies_total': 1}
+        self.assertFalse(BookForm(data={**data, 'isbn': '0-306-40615-2'}).is_valid())
+        self.assertTrue(BookForm(data={**data, 'isbn': '0306406152'}, instance=book).is_valid())
+
+    def test_django_admin_reports_duplicates_instead_of_failing(self):
+        Book.objects.create(isbn='9780306406157', title='Signals', author='A', category='General')
+        self.client.force_login(User.objects.create_superuser('root', 'pw'))
+        response = self.client.post('/django-admin/library/book/add/', {
+            'isbn': '0306406152', 'title': 'Copy', 'author': 'A', 'category': 'General',
+            'copies_total': 1, 'copies_available': 1
+        })
+        self.assertContains(response, 'A book with this ISBN already exists')
+        response = self.client.post('/django-admin/library/book/add/', {
+            'isbn': '978-0-306-40615-8', 'title': 'Typo', 'author': 'A', 'category': 'General',
+            'copies_total': 1, 'copies_available': 1
+        })
+        self.assertContains(response, 'invalid check digit')
+        self.assertEqual(Book.objects.count(), 1)
+
+
+class BookRecordCacheTests(TestCase):
+    def setUp(self):
+        caches['books'].clear()
+        reset_cache_stats()
+        self.book = Book.objects.create(isbn='0-306-40615-2', title='Signals', author='A', category='General', copies_available=3)
+
+    def test_second_lookup_is_served_from_cache(self):
+        with self.assertNumQueries(1):
+            record = get_book_record('9780306406157')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_book_record('0306406152'), record)
+        self.assertEqual(record['copies_available'], 3)
+        stats = cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 0.5))
+
+    def test_book_save_invalidates_old_and_new_isbn(self):
+        get_book_record('0306406152')
+        self.book.isbn = '9780804429573'
+        self.book.title = 'Renamed'
+        self.book.save()
+        self.assertIsNone(get_book_record('0306406152'))
+        self.assertEqual(get_book_record('9780804429573')['title'], 'Renamed')
+
+    def test_stock_changes_invalidate(self):
+        get_book_record('0306406152')
+        Book.objects.filter(id=self.book.id).update(copies_available=0)
+        invalidate_books([self.book.id])
+        self.assertEqual(get_book_record('0306406152')['copies_available'], 0)
+
+    def test_delete_invalidates(self):
+        get_book_record('0306406152')
+        self.book.delete()
+        self.assertIsNone(get_book_record('0306406152'))
+
+
+class PosBorrowBatchTests(TestCase):
+    def setUp(self):
+        self.kiosk = User.objects.create_user(username='kiosk', password='pw', user_type='pos')
+        self.client.force_login(self.kiosk)
+        session = self.client.session
+        session['pos_student_id'] = '2025-0900'
+        session.save()
+        self.books = [
+            Book.objects.create(isbn=f'BAT{i:04d}', title=f'Batch {i}', author='A', category='General', copies_available=1)
+            for i in range(3)
+        ]
+        Book.objects.filter(id=self.books[2].id).update(copies_available=0)
+
+    def _post(self, payload):
+        return self.client.post('/pos/borrow/batch/', json.dumps(payload), content_type='application/json')
+
+    def test_per_isbn_status(self):
+        response = self._post({'isbns': ['BAT0000', 'bat-0001', 'BAT0000', 'BAT0002', 'NOPE']})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            [row['status'] for row in data['results']],
+            ['found', 'found', 'duplicate', 'unavailable', 'not_found']
+        )
+        self.assertEqual(data['added'], 2)
+        self.assertEqual(self._post({'isbns': ['BAT0001']}).json()['results'][0]['status'], 'duplicate')
+
+    def test_rejects_anything_but_a_list_of_strings(self):
+        for isbns in ('BAT0000', [1234], {'isbn': 'BAT0000'}, None):
+            self.assertEqual(self._post({'isbns': isbns}).status_code, 400, isbns)
+        self.assertEqual(self._post({'isbns': []}).status_code, 400)
+
+
+class InventoryTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='pw', user_type='admin')
+        self.student = Student.objects.create(
+            student_id='2025-1000', last_name='Go', first_name='G',
+            course='BSIT', year='1', section='A', is_approved=True
+        )
+        self.books = [
+            Book.objects.create(isbn=f'INV{i:04d}', title=f'Stock {i}', author='A', category='General', copies_available=2)
+            for i in range(3)
+        ]
+
+    def _stock(self):
+        return [book.copies_available for book in Book.objects.filter(id__in=[b.id for b in self.books]).order_by('id')]
+
+    def test_take_and_return_in_grouped_updates(self):
+        ids = [self.books[0].id, self.books[0].id, self.books[1].id]
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(take_copies(ids), 1)
+        # One UPDATE per distinct quantity, not one per book
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in ctx.captured_queries), 2)
+        self.assertEqual(self._stock(), [0, 1, 2])
+        self.assertEqual(return_copies(ids), 1)
+        self.assertEqual(self._stock(), [2, 2, 2])
+
+    def test_shortage_changes_nothing_and_names_the_books(self):
+        ids = [self.books[0].id] * 3 + [self.books[1].id]
+        with self.assertRaises(InsufficientCopies) as ctx:
+            take_copies(ids)
+        self.assertEqual([book.id for book in ctx.exception.books], [self.books[0].id])
+        self.assertEqual(self._stock(), [2, 2, 2])
+
+    def test_a_loan_is_approved_only_once(self):
+        loan = create_loan(self.student, [self.books[0].id, self.books[1].id], self.admin)
+        approve_loan(loan, self.admin)
+        with self.assertRaises(LoanAlreadyProcessed):
+            approve_loan(loan, self.admin)
+        self.assertEqual(self._stock(), [1, 1, 2])
+
+    def test_failed_approval_leaves_the_loan_pending(self):
+        Book.objects.filter(id=self.books[0].id).update(copies_available=0)
+        loan = Transaction.objects.create(
+            student=self.student, transaction_code=Transaction.generate_transaction_code(),
+            due_date=timezone.now() + timezone.timedelta(days=7), item_count=1, open_item_count=1
+        )
+        TransactionItem.objects.create(transaction=loan, book=self.books[0])
+        with self.assertRaises(InsufficientCopies):
+            approve_loan(loan, self.admin)
+        loan.refresh_from_db()
+        self.assertEqual(loan.approval_status, 'pending')
+
+
+class PosCartTests(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+        self.request.session = SessionStore()
+        self.books = [
+            Book.objects.create(isbn=f'CRT{i:04d}', title=f'Cart {i}', author='A', category='General')
+            for i in range(3)
+        ]
+
+    def _exercise(self):
+        cart = PosCart(self.request)
+        self.assertEqual(cart.add_many([self.books[2].id, self.books[0].id, self.books[2].id]), [self.books[2].id, self.books[0].id])
+        self.assertFalse(cart.add(self.books[0].id))
+
+        # A fresh instance (another request, maybe another worker) sees the same cart
+        cart = PosCart(self.request)
+        self.assertIn(self.books[2].id, cart)
+        self.assertEqual([book['id'] for book in cart.books()], [self.books[2].id, self.books[0].id])
+        cart.remove([self.books[2].id])
+        self.assertEqual(PosCart(self.request).ids(), [self.books[0].id])
+        cart.clear()
+        self.assertEqual(len(PosCart(self.request)), 0)
+
+    def test_cache_store(self):
+        self._exercise()
+        self.assertFalse(PosCartRecord.objects.exists())
+
+    @override_settings(LIBRARY_POS_CART_STORE='database')
+    def test_database_store(self):
+        self._exercise()
+        PosCart(self.request).add(self.books[1].id)
+        record = PosCartRecord.objects.get()
+        self.assertEqual(record.book_ids, [self.books[1].id])
+        # SQLite ignores max_length; other backends would reject the key
+        record.full_clean()
+
+    @override_settings(LIBRARY_POS_CART_STORE='database')
+    def test_expired_database_cart_is_empty(self):
+        PosCart(self.request).add(self.books[1].id)
+        PosCartRecord.objects.update(expires_at=timezone.now() - timezone.timedelta(seconds=1))
+        self.assertEqual(PosCart(self.request).ids(), [])
+
+    def test_falls_back_to_database_when_cache_is_down(self):
+        down = mock.Mock(side_effect=ConnectionError('cache down'))
+        with mock.patch.object(CacheCartStore, 'get', down), mock.patch.object(CacheCartStore, 'set', down), \
+                self.assertLogs('library.cart', 'ERROR'):
+            PosCart(self.request).add(self.books[1].id)
+            self.assertEqual(PosCart(self.request).ids(), [self.books[1].id])
+        self.assertTrue(PosCartRecord.objects.exists())
+
+
+class KioskSyncTests(TestCase):
+    def setUp(self):
+        self.kiosk = User.objects.create_user(username='kiosk', password='pw', user_type='pos')
+        Student.objects.create(
+            student_id='2025-1100', last_name='Uy', first_name='U',
+            course='BSIT', year='1', section='A', is_approved=True
+        )
+        for i in range(2):
+            Book.objects.create(isbn=f'KSK{i:04d}', title=f'Kiosk {i}', author='A', category='General', copies_available=1)
+
+    def _borrow(self, key, isbns):
+        return {'key': key, 'type': 'borrow', 'student_id': '2025-1100', 'isbns': isbns}
+
+    def test_resent_key_replays_the_stored_result(self):
+        first, = apply_operations([self._borrow('k1', ['KSK0000'])], self.kiosk)
+        self.assertEqual((first['status'], first['replayed']), ('applied', False))
+        again, = apply_operations([self._borrow('k1', ['KSK0000'])], self.kiosk)
+        self.assertEqual((again['status'], again['replayed']), ('applied', True))
+        self.assertEqual(again['transaction_id'], first['transaction_id'])
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_reused_key_with_another_payload_is_rejected(self):
+        apply_operations([self._borrow('k1', ['KSK0000'])], self.kiosk)
+        conflict, = apply_operations([self._borrow('k1', ['KSK0001'])], self.kiosk)
+        self.assertEqual((conflict['status'], conflict['replayed']), ('rejected', True))
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_rejection_is_stored_and_leaves_no_writes(self):
+        result, = apply_operations([self._borrow('k1', ['KSK0000', 'MISSING'])], self.kiosk)
+        self.assertEqual(result['status'], 'rejected')
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(KioskOperation.objects.get().status, 'rejected')
+
+    def test_unhashable_type_is_rejected(self):
+        bad = {**self._borrow('k1', ['KSK0000']), 'type': ['borrow']}
+        rejected, applied = apply_operations([bad, self._borrow('k2', ['KSK0001'])], self.kiosk)
+        self.assertEqual((rejected['status'], rejected['error']), ('rejected', 'Unknown operation type'))
+        self.assertEqual(applied['status'], 'applied')
+
+    def test_isbns_must_be_a_list(self):
+        result, = apply_operations([self._borrow('k1', 'KSK0000')], self.kiosk)
+        self.assertEqual((result['status'], result['error']), ('rejected', 'isbns must be a list of strings'))
+
+    def test_handler_failure_can_be_resent(self):
+        calls = []
+
+        def fail_once(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise IntegrityError('boom')
+            return create_loan(*args)
+
+        with mock.patch('library.kiosk_sync.create_loan', side_effect=fail_once), \
+                self.assertLogs('library.kiosk_sync', 'ERROR'):
+            failed, ok = apply_operations([self._borrow('k1', ['KSK0000']), self._borrow('k2', ['KSK0001'])], self.kiosk)
+        self.assertEqual(failed['status'], 'error')
+        self.assertEqual(ok['status'], 'applied')
+        self.assertEqual(list(KioskOperation.objects.values_list('idempotency_key', flat=True)), ['k2'])
+
+        retried, = apply_operations([self._borrow('k1', ['KSK0000'])], self.kiosk)
+        self.assertEqual((retried['status'], retried['replayed']), ('applied', False))
+
+
+class NodeLeaseTests(TestCase):
+    def test_processes_claim_distinct_node_ids(self):
+        first, second = NodeLease(), NodeLease()
+        self.assertNotEqual(first.current(), second.current())
+        self.assertEqual(TransactionNodeLease.objects.count(), 2)
+
+    def test_forked_worker_claims_its_own_id(self):
+        lease = NodeLease()
+        parent = lease.current()
+        with mock.patch('library.codes.os.getpid', return_value=-1):
+            self.assertNotEqual(lease.current(), parent)
+
+    def test_expired_lease_is_reused(self):
+        now = timezone.now()
+        TransactionNodeLease.objects.create(node_id=0, owner='gone', expires_at=now - timezone.timedelta(seconds=1))
+        TransactionNodeLease.objects.create(node_id=1, owner='alive', expires_at=now + NODE_LEASE)
+        self.assertEqual(NodeLease().current(now), 0)
+        self.assertNotEqual(TransactionNodeLease.objects.get(node_id=0).owner, 'gone')
+
+    def test_claim_is_checked_again_until_committed(self):
+        lease = NodeLease()
+        with self.captureOnCommitCallbacks(execute=True):
+            node_id = lease.current()
+            self.assertFalse(lease.confirmed)
+        self.assertTrue(lease.confirmed)
+        with self.assertNumQueries(0):
+            self.assertEqual(lease.current(), node_id)
+
+    def test_lost_lease_is_replaced(self):
+        lease = NodeLease()
+        node_id = lease.current()
+        TransactionNodeLease.objects.filter(node_id=node_id).update(owner='someone else')
+        self.assertNotEqual(lease.current(), node_id)
+
+    def test_generated_codes_carry_the_leased_node_id(self):
+        generator = TransactionCodeGenerator()
+        code = generator.generate()
+        self.assertEqual(int(code[20:24]), TransactionNodeLease.objects.get().node_id)
+
+
+class BookSearchTests(TestCase):
+    def setUp(self):
+        self.title_hit = Book.objects.create(isbn='978-0-13-468599-1', title='Compilers', author='Aho', category='Computing')
+        self.description_hit = Book.objects.create(
+            isbn='9780262046305', title='Algorithms', author='Cormen', category='Computing',
+            description='Covers parsing and compilers in one chapter'
+        )
+
+    def _ids(self, text, **kwargs):
+        return [book.id for book in search_books(text, **kwargs)]
+
+    def test_title_matches_rank_above_description_matches(self):
+        self.assertEqual(self._ids('compil'), [self.title_hit.id, self.description_hit.id])
+
+    def test_partial_isbn_matches(self):
+        self.assertEqual(self._ids('0-13-4685'), [self.title_hit.id])
+        self.assertEqual(self._ids('0134685'), [self.title_hit.id])
+        self.assertEqual(self._ids('0262', ranked=False), [self.description_hit.id])
+
+    def test_triggers_keep_the_index_in_sync(self):
+        self.title_hit.title = 'Dragon Book'
+        self.title_hit.save()
+        self.assertEqual(self._ids('dragon'), [self.title_hit.id])
+        self.assertEqual(self._ids('compilers'), [self.description_hit.id])
+        self.description_hit.delete()
+        self.assertEqual(self._ids('compilers'), [])
+
+    def test_rebuild_search_index_restores_the_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')")
+        self.assertEqual(self._ids('compilers'), [])
+        out = io.StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('2 book(s)', out.getvalue())
+        self.assertEqual(len(self._ids('compilers')), 2)
+
+    def test_queries_never_scan_the_catalog(self):
+        for text, ranked in (('harry', True), ('harry potter', False), ('978-0-13', True), ('0134', False)):
+            plan = search_books(text, ranked=ranked)[:24].explain()
+            self.assertNotRegex(plan, r'SCAN library_book\b(?!_fts)', (text, plan))
+            self.assertNotIn('CORRELATED', plan, (text, plan))
+
+    def test_ranked_results_page_past_any_cap(self):
+        Book.objects.bulk_create([
+            Book(isbn=f'PAGED{i:04d}', canonical_isbn=f'PAGED{i:04d}', title=f'Paging {i}', author='Author', category='General')
+            for i in range(30)
+        ])
+        ids, after = [], None
+        while True:
+            page = keyset_paginate(search_books('paging'), RANKED_ORDERING, after=after, per_page=7)
+            ids += [book.id for book in page]
+            if not page.has_next:
+                break
+            after = page.next_cursor
+        self.assertEqual(len(ids), 30)
+        self.assertEqual(ids, self._ids('paging'))
+
+
+class DeferredThread:
+    # Stands in for threading.Thread; the test decides when a started thread runs
+    started = []
+
+    def __init__(self, target, **kwargs):
+        self.target = target
+
+    def start(self):
+        DeferredThread.started.append(self.target)
+
+    @classmethod
+    def run_started(cls):
+        with mock.patch('library.autocomplete.connection'):
+            for target in cls.started:
+                target()
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        DeferredThread.started = []
+        self.potter = Book.objects.create(isbn='AC0001', title='Harry Potter', author='J. K. Rowling', category='Fiction')
+        self.hamlet = Book.objects.create(isbn='AC0002', title='Hamlet', author='William Shakespeare', category='Drama')
+        self.index = PrefixIndex()
+
+    def _titles(self, query):
+        return [suggestion['title'] for suggestion in self.index.suggest(query)]
+
+    def _later(self):
+        return mock.patch('library.autocomplete.time.monotonic', return_value=time.monotonic() + 3600)
+
+    def test_prefix_lookup(self):
+        self.assertEqual(self._titles('ha'), ['Hamlet', 'Harry Potter'])
+        self.assertEqual(self._titles('harr pot'), ['Harry Potter'])
+        self.assertEqual(self._titles('rowl'), ['Harry Potter'])
+        self.assertEqual(self._titles('potter harr'), ['Harry Potter'])
+        self.assertEqual(self._titles('xyz'), [])
+
+    def test_edits_in_this_process_apply_at_once(self):
+        self._titles('ha')
+        self.index.update_book(self.hamlet.id, 'Macbeth', 'William Shakespeare')
+        self.assertEqual(self._titles('mac'), ['Macbeth'])
+        self.assertEqual(self._titles('ham'), [])
+        self.index.remove_book(self.potter.id)
+        self.assertEqual(self._titles('harry'), [])
+
+    @override_settings(LIBRARY_AUTOCOMPLETE_MAX_AGE=300)
+    def test_edits_elsewhere_show_up_after_a_background_rebuild(self):
+        self._titles('ha')
+        # An edit made by another process sends no signal here
+        Book.objects.filter(id=self.hamlet.id).update(title='Macbeth')
+        self.assertEqual(self._titles('mac'), [])
+
+        with mock.patch('library.autocomplete.threading.Thread', DeferredThread), self._later():
+            # The stale index answers this lookup; the rebuild is for the next one
+            self.assertEqual(self._titles('mac'), [])
+            self.assertEqual(self._titles('mac'), [])
+            self.assertEqual(len(DeferredThread.started), 1)
+        DeferredThread.run_started()
+        self.assertEqual(self._titles('mac'), ['Macbeth'])
+        self.assertFalse(self.index._build_lock.locked())
+
+    def test_only_one_rebuild_runs_at_a_time(self):
+        self._titles('ha')
+        self.index._build_lock.acquire()
+        try:
+            with mock.patch('library.autocomplete.threading.Thread', DeferredThread), self._later():
+                self.assertEqual(self._titles('ham'), ['Hamlet'])
+        finally:
+            self.index._build_lock.release()
+        self.assertEqual(DeferredThread.started, [])
+
+
+class KioskValidationTests(TestCase):
+    def setUp(self):
+        caches['books'].clear()
+        Student.objects.create(
+            student_id='2025-1200', last_name='Sy', first_name='Ivy',
+            course='BSIT', year='1', section='A', is_approved=True
+        )
+        Student.objects.create(
+            student_id='2025-1201', last_name='Sy', first_name='Ian',
+            course='BSIT', year='1', section='A', is_approved=False
+        )
+        Book.objects.create(isbn='0-306-40615-2', title='On Shelf', author='A', category='General', copies_available=1)
+        Book.objects.create(isbn='9780262046305', title='All Out', author='B', category='General', copies_available=0)
+
+    def _student(self, student_id):
+        return self.client.get('/pos/validate/', {'student_id': student_id})
+
+    def test_student_lookup(self):
+        self.assertEqual(self._student('2025-1200').json(), {'valid': True, 'approved': True})
+        self.assertEqual(self._student('2025-1201').json()['approved'], False)
+        self.assertEqual(self._student('2025-9999').json()['valid'], False)
+        self.assertEqual(self._student('').status_code, 400)
+        self.assertEqual(self.client.post('/pos/validate/').status_code, 405)
+
+    def test_session_is_written_only_when_the_student_changes(self):
+        self.assertIn(settings.SESSION_COOKIE_NAME, self._student('2025-1200').cookies)
+        self.assertEqual(self.client.session['student_id'], '2025-1200')
+        # Same student again: nothing to save, so no new cookie
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self._student('2025-1200').cookies)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self._student('2025-1201').cookies)
+
+    def test_book_lookup(self):
+        found = self.client.get('/pos/borrow/validate/', {'isbn': '9780306406157'}).json()
+        self.assertEqual((found['valid'], found['unavailable'], found['book']['title']), (True, False, 'On Shelf'))
+        out = self.client.get('/pos/borrow/validate/', {'isbn': '978-0-262-04630-5'}).json()
+        self.assertEqual((out['valid'], out['unavailable']), (True, True))
+        missing = self.client.get('/pos/borrow/validate/', {'isbn': '9780000000002'}).json()
+        self.assertEqual((missing['valid'], missing['reason']), (False, 'Book not found.'))
@@ -0,0 +1,17 @@
+import re
+import unicodedata
+
+
+def fold(text):
+    """Lower-case `text` and strip accents, so "Peña" and "pena" compare equal."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def words(text):
+    return re.findall(r'\w+', fold(text))
+
+
+def normalize_student_id(raw):
+    # "2025-0001", "2025 0001" and "20250001" are typed interchangeably
+    return ''.join(words(raw))
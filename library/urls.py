@@ -11,6 +11,10 @@ urlpatterns = [
     
     path('student/dashboard/', views.student_dashboard, name='student_dashboard'),
     path('student/settings/', views.student_settings, name='student_settings'),
+    path('books/search/', views.search_books_api, name='search_books_api'),
+    path('books/list/', views.books_api, name='books_api'),
+    path('books/autocomplete/', views.autocomplete_books, name='autocomplete_books'),
+    path('books/<int:book_id>/recommendations/', views.book_recommendations, name='book_recommendations'),
     
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('admin/import-students/', views.import_students_csv, name='import_students_csv'),
@@ -29,13 +33,18 @@ urlpatterns = [
     path('admin/transactions/pending/', views.pending_transactions, name='pending_transactions'),
     path('admin/transactions/approve/<int:transaction_id>/', views.approve_transaction, name='approve_transaction'),
     path('admin/transactions/reject/<int:transaction_id>/', views.reject_transaction, name='reject_transaction'),
+    path('admin/transactions/overdue/', views.overdue_report, name='overdue_report'),
     path('admin/create-pos/', views.create_pos_account, name='create_pos_account'),
     path('admin/settings/', views.admin_settings, name='admin_settings'),
+    path('admin/cache-stats/', views.book_cache_stats, name='book_cache_stats'),
+    path('admin/analytics/', views.circulation_analytics, name='circulation_analytics'),
     
     path('pos/home/', views.pos_home, name='pos_home'),
     path('pos/options/', views.pos_options, name='pos_options'),
     path('pos/borrow/', views.pos_borrow_book, name='pos_borrow_book'),
     path('pos/return/', views.pos_return_book, name='pos_return_book'),
+    path('pos/borrow/batch/', views.pos_borrow_batch, name='pos_borrow_batch'),
+    path('pos/sync/', views.pos_sync, name='pos_sync'),
     path('pos/options/', views.pos_options, name='pos_options'),  # make sure the view name is pos_options
     
     path('validate-book-isbn/', views.validate_book_isbn, name='validate_book_isbn'),
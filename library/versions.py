@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+def _cache():
+    return caches[getattr(settings, 'LIBRARY_VERSION_CACHE_ALIAS', 'default')]
+
+
+def _key(name):
+    return f'version:{name}'
+
+
+def get_versions(*names):
+    """
+    Current version number of each named entity ("books", "student:42", ...)
+    in one cache round trip. Anything cached under a key that embeds these
+    numbers goes stale exactly when one of them is bumped.
+    """
+    cache = _cache()
+    found = cache.get_many([_key(name) for name in names])
+    versions = {}
+    for name in names:
+        version = found.get(_key(name))
+        if version is None:
+            # Seeded from the clock so an evicted counter never restarts
+            # below a version that still has entries in the cache
+            cache.add(_key(name), time.time_ns(), timeout=None)
+            version = cache.get(_key(name))
+        versions[name] = version
+    return versions
+
+
+def get_version(name):
+    return get_versions(name)[name]
+
+
+def bump(*names):
+    cache = _cache()
+    for name in names:
+        try:
+            cache.incr(_key(name))
+        except ValueError:
+            get_versions(name)
+
+
+def bump_on_commit(*names):
+    # Bumping before commit would let a concurrent reader cache the old
+    # state under the new version
+    transaction.on_commit(lambda: bump(*names))
@@ -2,15 +2,33 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Q
 from django.db import transaction
-from datetime import timedelta
+from datetime import date, timedelta
 import csv
+import json
+import logging
 from io import TextIOWrapper
 from .models import User, Student, Book, Transaction, TransactionItem, VerificationCode
+from .isbn import canonicalize_isbn, looks_like_mistyped_isbn
+from .cache import get_book_record, aget_book_record, cache_stats, BOOK_RECORD_FIELDS
+from .inventory import approve_loan, InsufficientCopies, LoanAlreadyProcessed
+from .circulation import create_loan, return_items, ItemsAlreadyReturned
+from .cart import PosCart
+from .kiosk_sync import apply_operations, MAX_OPERATIONS_PER_BATCH
+from .search import RANKED_ORDERING, search_books
+from .facets import book_facets, filter_by_facets
+from .counters import read_counters
+from .fragments import cached_fragment, fragment_stats
+from .loan_summary import get_loan_summary
+from .analytics import PERIODS, circulation_report, default_range
+from .recommendations import recommended_for_book, recommended_for_student
+from .overdue import newly_overdue, overdue_summary
+from .outbox import enqueue_email
+from .student_search import search_students
+from .pagination import paginate_request
+from .autocomplete import book_index
 
 from .models import User, Student, Book, Transaction, VerificationCode
 from .forms import (LoginForm, StudentIDVerificationForm, StudentRegistrationForm,
@@ -24,6 +42,9 @@ from django.utils import timezone
 from datetime import timedelta
 from .models import Student, Book, Transaction, TransactionItem
 
+logger = logging.getLogger(__name__)
+
+
 def user_login(request):
     if request.user.is_authenticated:
         return redirect('dashboard')
@@ -172,41 +193,59 @@ def student_dashboard(request):
     if request.user.user_type != 'student':
         return redirect('dashboard')
     
-    student = Student.objects.get(user=request.user)
-    borrowed_books = Transaction.objects.filter(
-        student=student,
-        status='borrowed',
-        approval_status='approved'
-    ).prefetch_related('items__book')
+    student = Student.objects.select_related('loan_summary').get(user=request.user)
+    summary = get_loan_summary(student)
     
-    history = Transaction.objects.filter(
-        student=student,
-        approval_status='approved'
-    ).prefetch_related('items__book').order_by('-borrowed_date')[:10]
+    def loan_panels():
+        return {
+            'summary': summary,
+            'borrowed_books': summary.get_open_loans(),
+            'history': summary.get_history()
+        }
     
     search_query = request.GET.get('search', '')
     category = request.GET.get('category', '')
+    availability = request.GET.get('availability', '')
+    decade = request.GET.get('decade', '')
     
     books = Book.objects.all()
     if search_query:
-        books = books.filter(
-            Q(title__icontains=search_query) |
-            Q(author__icontains=search_query) |
-            Q(isbn__icontains=search_query)
-        )
-    if category:
-        books = books.filter(category=category)
+        books = search_books(search_query, books)
+    books = filter_by_facets(books, category, availability, decade)
+    
+    # Search results are paged in relevance order, the full catalog by title
+    ordering = RANKED_ORDERING if search_query else ('title', 'id')
+    page = paginate_request(request, books, ordering, per_page=24)
+    books = page.items
     
-    categories = Book.objects.values_list('category', flat=True).distinct()
+    filters = {
+        'search_query': search_query,
+        'selected_category': category,
+        'selected_availability': availability,
+        'selected_decade': decade
+    }
     
     context = {
         'student': student,
-        'borrowed_books': borrowed_books,
-        'history': history,
         'books': books,
-        'categories': categories,
-        'search_query': search_query,
-        'selected_category': category
+        'page': page,
+        'loan_panels': cached_fragment(
+            'student_loans', [f'student:{student.id}'],
+            'library/_student_loans.html', loan_panels,
+            # Loans turn overdue with no write to bump a version
+            vary_on=[summary.overdue_count()]
+        ),
+        'recommendations_panel': cached_fragment(
+            'student_recommendations', ['recommendations', f'student:{student.id}'],
+            'library/_recommendations.html',
+            lambda: {'recommended_books': recommended_for_student(student)}
+        ),
+        'catalog_filters': cached_fragment(
+            'catalog_filters', ['books'], 'library/_catalog_filters.html',
+            lambda: {'facets': book_facets(search_query), **filters},
+            vary_on=filters.values()
+        ),
+        **filters
     }
     
     return render(request, 'library/student_dashboard.html', context)
@@ -217,23 +256,37 @@ def admin_dashboard(request):
     if request.user.user_type != 'admin':
         return redirect('dashboard')
     
-    total_students = Student.objects.count()
-    total_books = Book.objects.count()
-    total_borrowed = Transaction.objects.filter(status='borrowed', approval_status='approved').count()
-    total_available = Book.objects.filter(copies_available__gt=0).count()
-    pending_registrations = Student.objects.filter(user__isnull=False, is_approved=False).count()
-    pending_borrowing = Transaction.objects.filter(approval_status='pending').count()
+    def stats():
+        counts = read_counters()
+        return {
+            'total_students': counts['students'],
+            'total_books': counts['books'],
+            'total_borrowed': counts['borrowed_loans'],
+            'total_available': counts['available_books'],
+            'pending_registrations': counts['pending_registrations'],
+            'pending_borrowing': counts['pending_loans'],
+        }
     
-    recent_transactions = Transaction.objects.filter(approval_status='approved').select_related('student').prefetch_related('items__book').order_by('-borrowed_date')[:10]
+    def recent_transactions():
+        return {
+            'recent_transactions': Transaction.objects.filter(
+                approval_status='approved'
+            ).select_related('student').order_by('-borrowed_date')[:5]
+        }
     
     context = {
-        'total_students': total_students,
-        'total_books': total_books,
-        'total_borrowed': total_borrowed,
-        'total_available': total_available,
-        'pending_registrations': pending_registrations,
-        'pending_borrowing': pending_borrowing,
-        'recent_transactions': recent_transactions
+        'stat_cards': cached_fragment(
+            'admin_stat_cards', ['students', 'books', 'transactions', 'counters'],
+            'library/_admin_stat_cards.html', stats
+        ),
+        'quick_actions': cached_fragment(
+            'admin_quick_actions', ['students', 'transactions', 'counters'],
+            'library/_admin_quick_actions.html', stats
+        ),
+        'recent_transactions_panel': cached_fragment(
+            'admin_recent_transactions', ['students', 'transactions'],
+            'library/_admin_recent_transactions.html', recent_transactions
+        ),
     }
     
     return render(request, 'library/admin_dashboard.html', context)
@@ -265,10 +318,11 @@ def import_books_csv(request):
                     copies_total = row.get('copies_total', '1').strip()
                     description = row.get('description', '').strip()
                     
-                    if isbn and title and author and category:
+                    if isbn and title and author and category and not looks_like_mistyped_isbn(isbn):
                         book, created = Book.objects.get_or_create(
-                            isbn=isbn,
+                            canonical_isbn=canonicalize_isbn(isbn),
                             defaults={
+                                'isbn': isbn,
                                 'title': title,
                                 'author': author,
                                 'category': category,
@@ -350,18 +404,17 @@ def manage_books(request):
     if request.user.user_type != 'admin':
         return redirect('dashboard')
     
-    books = Book.objects.all().order_by('title')
+    books = Book.objects.all()
     search_query = request.GET.get('search', '')
     
     if search_query:
-        books = books.filter(
-            Q(title__icontains=search_query) |
-            Q(author__icontains=search_query) |
-            Q(isbn__icontains=search_query)
-        )
+        books = search_books(search_query, books, ranked=False)
+    
+    page = paginate_request(request, books, ('title', 'id'))
     
     return render(request, 'library/manage_books.html', {
-        'books': books,
+        'books': page.items,
+        'page': page,
         'search_query': search_query
     })
 
@@ -407,7 +460,11 @@ def edit_book(request, book_id):
     else:
         form = BookForm(instance=book)
     
-    return render(request, 'library/edit_book.html', {'form': form, 'book': book})
+    return render(request, 'library/edit_book.html', {
+        'form': form,
+        'book': book,
+        'recommended_books': recommended_for_book(book.id)
+    })
 
 
 @login_required
@@ -417,18 +474,17 @@ def manage_students(request):
     
     pending_students = Student.objects.filter(user__isnull=False, is_approved=False).order_by('-created_at')
     
-    students = Student.objects.all().order_by('last_name')
+    students = Student.objects.all()
     search_query = request.GET.get('search', '')
     
     if search_query:
-        students = students.filter(
-            Q(student_id__icontains=search_query) |
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query)
-        )
+        students = search_students(search_query, students)
+    
+    page = paginate_request(request, students, ('last_name', 'first_name', 'id'))
     
     return render(request, 'library/manage_students.html', {
-        'students': students,
+        'students': page.items,
+        'page': page,
         'pending_students': pending_students,
         'search_query': search_query
     })
@@ -453,12 +509,23 @@ def approve_student(request, student_id):
     
     if request.method == 'POST':
         student = get_object_or_404(Student, id=student_id)
-        student.is_approved = True
-        student.save()
-        
-        if student.user:
-            student.user.is_active = True
-            student.user.save()
+        with transaction.atomic():
+            student.is_approved = True
+            student.save()
+            
+            if student.user:
+                student.user.is_active = True
+                student.user.save()
+                if student.user.email:
+                    # Queued with the approval; deliver_outbox sends it
+                    enqueue_email(
+                        'Your library account has been approved',
+                        f"Dear {student.get_full_name()},\n\n"
+                        f"Your library account ({student.student_id}) has been approved. "
+                        f"You can now log in and borrow books.\n\n"
+                        f"Thank you,\nLibrary Management System\n",
+                        [student.user.email]
+                    )
         
         messages.success(request, f'Student {student.get_full_name()} has been approved and can now login.')
         return redirect('manage_students')
@@ -533,10 +600,12 @@ def pending_transactions(request):
     if request.user.user_type != 'admin':
         return redirect('dashboard')
     
-    pending = Transaction.objects.filter(approval_status='pending').select_related('student', 'created_by').prefetch_related('items__book').order_by('-borrowed_date')
+    pending = Transaction.objects.filter(approval_status='pending').select_related('student', 'created_by').prefetch_related('items__book')
+    page = paginate_request(request, pending, ('-borrowed_date', '-id'))
     
     return render(request, 'library/pending_transactions.html', {
-        'pending_transactions': pending
+        'pending_transactions': page.items,
+        'page': page
     })
 
 
@@ -546,19 +615,17 @@ def approve_transaction(request, transaction_id):
         return redirect('dashboard')
     
     if request.method == 'POST':
-        transaction = Transaction.objects.get(id=transaction_id)
+        transaction = get_object_or_404(Transaction.objects.select_related('student'), id=transaction_id)
         
-        for item in transaction.items.all():
-            item.book.copies_available -= 1
-            item.book.save()
-        
-        transaction.approval_status = 'approved'
-        transaction.approved_by = request.user
-        transaction.approved_at = timezone.now()
-        transaction.save()
-        
-        book_count = transaction.items.count()
-        messages.success(request, f'{book_count} book(s) borrowing approved for {transaction.student.get_full_name()}')
+        try:
+            approve_loan(transaction, request.user)
+        except LoanAlreadyProcessed:
+            messages.warning(request, f'Transaction {transaction.transaction_code} was already processed')
+        except InsufficientCopies as e:
+            titles = ', '.join(book.title for book in e.books)
+            messages.error(request, f'Cannot approve {transaction.transaction_code}: no copies left of {titles}')
+        else:
+            messages.success(request, f'{transaction.item_count} book(s) borrowing approved for {transaction.student.get_full_name()}')
     
     return redirect('pending_transactions')
 
@@ -792,7 +859,6 @@ from datetime import timedelta
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from .models import Student, Book, Transaction, TransactionItem
-import re
 
 @login_required
 @csrf_exempt
@@ -806,15 +872,15 @@ def pos_borrow_book(request):
 
     try:
         student = Student.objects.get(student_id=student_id, is_approved=True)
-        request.session['pos_student_id'] = student_id
     except Student.DoesNotExist:
         messages.error(request, 'Student not found or not approved.')
         return redirect('pos_home')
 
-    # Initialize book list in session
-    if 'pos_books' not in request.session:
-        request.session['pos_books'] = []
-    books = request.session['pos_books']
+    # Only touch the session when the student changes, not on every scan
+    if request.session.get('pos_student_id') != student_id:
+        request.session['pos_student_id'] = student_id
+
+    cart = PosCart(request)
 
     # ✅ AJAX auto-scan add (GET request with ISBN)
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
@@ -822,64 +888,31 @@ def pos_borrow_book(request):
         if not isbn_raw:
             return JsonResponse({'success': False, 'message': 'Missing ISBN.'})
 
-        isbn = re.sub(r'[^0-9A-Za-z]', '', isbn_raw).upper()
-        found_book = None
-        for book in Book.objects.all():
-            db_isbn = re.sub(r'[^0-9A-Za-z]', '', (book.isbn or '')).upper()
-            if db_isbn == isbn:
-                found_book = book
-                break
+        found_book = get_book_record(isbn_raw)
 
         if not found_book:
             return JsonResponse({'success': False, 'message': f'Book not found ({isbn_raw})'})
 
-        # Check if already added
-        if any(b['id'] == found_book.id for b in books):
+        if not cart.add(found_book['id']):
             return JsonResponse({'success': False, 'message': 'Book already added.'})
 
-        # Append to session
-        books.append({
-            'id': found_book.id,
-            'title': found_book.title,
-            'isbn': found_book.isbn,
-            'author': found_book.author
-        })
-        request.session['pos_books'] = books
-        request.session.modified = True
-        return JsonResponse({'success': True, 'message': f'Added: {found_book.title}'})
+        return JsonResponse({'success': True, 'message': f'Added: {found_book["title"]}'})
 
     # ✅ Manual "Add Book" button
     if request.method == 'POST' and 'add_book' in request.POST:
         isbn_raw = request.POST.get('isbn', '').strip()
-        isbn = re.sub(r'[^0-9A-Za-z]', '', isbn_raw).upper()
-        found_book = None
-
-        for book in Book.objects.all():
-            db_isbn = re.sub(r'[^0-9A-Za-z]', '', (book.isbn or '')).upper()
-            if db_isbn == isbn:
-                found_book = book
-                break
+        found_book = get_book_record(isbn_raw)
 
         if not found_book:
             messages.error(request, f'Book not found: {isbn_raw}')
-        elif any(b['id'] == found_book.id for b in books):
+        elif not cart.add(found_book['id']):
             messages.warning(request, 'Book already added.')
         else:
-            books.append({
-                'id': found_book.id,
-                'title': found_book.title,
-                'isbn': found_book.isbn,
-                'author': found_book.author
-            })
-            request.session['pos_books'] = books
-            request.session.modified = True
-            messages.success(request, f'Added: {found_book.title}')
-            
-            
+            messages.success(request, f'Added: {found_book["title"]}')
 
         return render(request, 'library/pos_borrow_book.html', {
             'student': student,
-            'books': books,
+            'books': cart.books(),
             'step': 'add_books'
         })
 
@@ -888,41 +921,105 @@ def pos_borrow_book(request):
         if 'continue_borrow' in request.POST:
             return render(request, 'library/pos_borrow_book.html', {
                 'student': student,
-                'books': books,
+                'books': cart.books(),
                 'step': 'confirm'
             })
 
         elif 'confirm_borrow' in request.POST:
-            if not books:
+            if not len(cart):
                 messages.error(request, 'No books selected.')
                 return render(request, 'library/pos_borrow_book.html', {
                     'student': student,
-                    'books': books,
+                    'books': [],
                     'step': 'add_books'
                 })
 
-            transaction = Transaction.objects.create(
-                student=student,
-                transaction_code=Transaction.generate_transaction_code(),
-                due_date=timezone.now() + timedelta(days=7),
-                created_by=request.user
-            )
-
-            for b in books:
-                book = Book.objects.get(id=b['id'])
-                TransactionItem.objects.create(transaction=transaction, book=book)
+            try:
+                transaction = create_loan(student, cart.ids(), request.user)
+            except InsufficientCopies as e:
+                # Drop the books that can no longer be lent and let the student review the rest
+                cart.remove({book.id for book in e.books} | set(e.missing_ids))
+                titles = ', '.join(book.title for book in e.books) or 'a removed book'
+                messages.error(request, f'No longer available: {titles}. Please review your books.')
+                return render(request, 'library/pos_borrow_book.html', {
+                    'student': student,
+                    'books': cart.books(),
+                    'step': 'add_books'
+                })
 
-            request.session.pop('pos_books', None)
+            cart.clear()
             request.session.pop('pos_student_id', None)
             return redirect('pos_borrow_success', transaction_id=transaction.id)
 
     # Default
     return render(request, 'library/pos_borrow_book.html', {
         'student': student,
-        'books': books,
+        'books': cart.books(),
         'step': 'add_books'
     })
 
+POS_BATCH_MAX_ISBNS = 50
+
+
+@login_required
+def pos_borrow_batch(request):
+    if request.user.user_type != 'pos':
+        return JsonResponse({'success': False, 'error': 'Unauthorized'}, status=403)
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
+    if not request.session.get('pos_student_id'):
+        return JsonResponse({'success': False, 'error': 'No student selected'}, status=400)
+
+    if request.content_type == 'application/json':
+        try:
+            raw_isbns = json.loads(request.body).get('isbns', [])
+        except (ValueError, AttributeError):
+            return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+    else:
+        raw_isbns = request.POST.getlist('isbns')
+
+    # A bare string would otherwise be scanned one character at a time
+    if not isinstance(raw_isbns, list) or not all(isinstance(isbn, str) for isbn in raw_isbns):
+        return JsonResponse({'success': False, 'error': 'isbns must be a list of strings'}, status=400)
+
+    raw_isbns = [isbn.strip() for isbn in raw_isbns if isbn.strip()]
+    if not raw_isbns:
+        return JsonResponse({'success': False, 'error': 'No ISBNs provided'}, status=400)
+    if len(raw_isbns) > POS_BATCH_MAX_ISBNS:
+        return JsonResponse({'success': False, 'error': f'At most {POS_BATCH_MAX_ISBNS} ISBNs per batch'}, status=400)
+
+    # One IN query for the whole burst
+    canonical = {raw: canonicalize_isbn(raw) for raw in raw_isbns}
+    found = Book.objects.filter(
+        canonical_isbn__in={isbn for isbn in canonical.values() if isbn}
+    ).values('canonical_isbn', *BOOK_RECORD_FIELDS)
+    books_by_isbn = {book['canonical_isbn']: book for book in found}
+
+    cart = PosCart(request)
+    to_add = []
+    results = []
+
+    for raw in raw_isbns:
+        book = books_by_isbn.get(canonical[raw])
+        if book is None:
+            results.append({'isbn': raw, 'status': 'not_found'})
+            continue
+
+        if book['id'] in cart or book['id'] in to_add:
+            status = 'duplicate'
+        elif book['copies_available'] <= 0:
+            status = 'unavailable'
+        else:
+            status = 'found'
+            to_add.append(book['id'])
+        results.append({'isbn': raw, 'status': status, 'book_id': book['id'], 'title': book['title']})
+
+    # The cart is written once so a burst is all-or-nothing
+    cart.add_many(to_add)
+
+    return JsonResponse({'success': True, 'added': len(to_add), 'results': results, 'books': cart.books()})
+
+
 @login_required
 def pos_borrow_success(request, transaction_id):
     try:
@@ -936,14 +1033,16 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from .models import Student
 
+# The two kiosk lookups below are async views: under ASGI (see
+# library_system/asgi.py) a worker keeps serving other kiosks while these
+# wait on the database or cache instead of blocking a thread each.
 @csrf_exempt
-def validate_student_id(request):
+async def validate_student_id(request):
     # Only allow GET requests
     if request.method != "GET":
         return JsonResponse({"error": "Invalid request method."}, status=405)
 
     student_id = request.GET.get('student_id', '').strip()
-    print("📥 Student ID received:", student_id)  # Debug output
 
     if not student_id:
         return JsonResponse({
@@ -953,13 +1052,14 @@ def validate_student_id(request):
         }, status=400)
 
     try:
-        student = Student.objects.get(student_id=student_id)
-        print("✅ Student found:", student)
+        is_approved = await Student.objects.filter(
+            student_id=student_id
+        ).values_list('is_approved', flat=True).aget()
 
-        if getattr(student, "is_approved", False):
-            # ✅ Save student in session so Django remembers them
-            request.session['student_id'] = student_id
-            print(f"💾 Session saved for student: {student_id}")
+        if is_approved:
+            # ✅ Save student in session so Django remembers them (only when it changes)
+            if await request.session.aget('student_id') != student_id:
+                await request.session.aset('student_id', student_id)
 
             return JsonResponse({
                 "valid": True,
@@ -978,55 +1078,154 @@ def validate_student_id(request):
             "reason": "You are not registered. Please register first."
         })
     except Exception as e:
-        print("❌ Unexpected error:", e)
+        logger.exception("Student ID validation failed for %s", student_id)
         return JsonResponse({
             "valid": False,
             "approved": False,
             "reason": "Server error: " + str(e)
         }, status=500)
 
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-from library.models import Book
 
 @csrf_exempt
-def validate_book_isbn(request):
+async def validate_book_isbn(request):
     raw_isbn = request.GET.get("isbn", "").strip()
     if not raw_isbn:
         return JsonResponse({"valid": False, "reason": "Missing ISBN."})
 
-    # Normalize ISBN (remove spaces, dashes, etc.)
-    normalized_isbn = ''.join(filter(str.isalnum, raw_isbn)).upper()
-
-    book = None
-    try:
-        # Try exact match first
-        book = Book.objects.get(isbn__iexact=raw_isbn)
-    except Book.DoesNotExist:
-        # Then try normalized match
-        for b in Book.objects.all():
-            db_isbn = ''.join(filter(str.isalnum, b.isbn)).upper()
-            if db_isbn == normalized_isbn:
-                book = b
-                break
+    # Cached by canonical ISBN (dashes, spaces, ISBN-10 vs 13 all share one key)
+    book = await aget_book_record(raw_isbn)
 
     if not book:
         return JsonResponse({"valid": False, "unavailable": False, "reason": "Book not found."})
 
-    # Check availability
-    unavailable = not book.is_available() if hasattr(book, "is_available") else False
-
     return JsonResponse({
         "valid": True,
-        "unavailable": unavailable,
+        "unavailable": book['copies_available'] <= 0,
         "book": {
-            "id": book.id,
-            "title": book.title,
-            "isbn": book.isbn,
-            "author": book.author
+            "id": book['id'],
+            "title": book['title'],
+            "isbn": book['isbn'],
+            "author": book['author']
         }
     })
 
+@login_required
+def pos_sync(request):
+    if request.user.user_type != 'pos':
+        return JsonResponse({'success': False, 'error': 'Unauthorized'}, status=403)
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
+
+    try:
+        operations = json.loads(request.body).get('operations')
+    except (ValueError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+    if not isinstance(operations, list) or not operations:
+        return JsonResponse({'success': False, 'error': 'No operations provided'}, status=400)
+    if len(operations) > MAX_OPERATIONS_PER_BATCH:
+        return JsonResponse({'success': False, 'error': f'At most {MAX_OPERATIONS_PER_BATCH} operations per batch'}, status=400)
+
+    return JsonResponse({'success': True, 'results': apply_operations(operations, request.user)})
+
+
+@login_required
+def search_books_api(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 100))
+    except ValueError:
+        limit = 20
+
+    if not query:
+        return JsonResponse({'query': query, 'results': []})
+
+    books = search_books(query).values('id', 'isbn', 'title', 'author', 'category', 'copies_available')[:limit]
+    return JsonResponse({'query': query, 'results': list(books)})
+
+
+@login_required
+def book_recommendations(request, book_id):
+    books = recommended_for_book(book_id)
+    return JsonResponse({
+        'book_id': book_id,
+        'recommendations': [
+            {'id': book.id, 'title': book.title, 'author': book.author, 'available': book.is_available()}
+            for book in books
+        ]
+    })
+
+
+@login_required
+def autocomplete_books(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 8)), 20))
+    except ValueError:
+        limit = 8
+    return JsonResponse({'query': query, 'suggestions': book_index.suggest(query, limit)})
+
+
+@login_required
+def books_api(request):
+    books = Book.objects.all()
+    category = request.GET.get('category', '')
+    if category:
+        books = books.filter(category=category)
+    
+    page = paginate_request(request, books.values('id', 'isbn', 'title', 'author', 'category', 'copies_available'), ('title', 'id'))
+    return JsonResponse({'results': page.items, 'cursors': page.as_dict()})
+
+
+@login_required
+def overdue_report(request):
+    if request.user.user_type != 'admin':
+        return redirect('dashboard')
+    
+    now = timezone.now()
+    loans = Transaction.objects.overdue(now).select_related('student')
+    summary = overdue_summary(now)
+    course = request.GET.get('course', '')
+    if course:
+        loans = loans.filter(student__course=course)
+    only_new = request.GET.get('new') == '1'
+    if only_new:
+        loans = loans.filter(newly_overdue(summary['last_sweep']))
+    page = paginate_request(request, loans, ('due_date', 'id'), per_page=50)
+    
+    return render(request, 'library/overdue_report.html', {
+        'loans': page.items,
+        'page': page,
+        'summary': summary,
+        'selected_course': course,
+        'only_new': only_new,
+        'now': now
+    })
+
+
+@login_required
+def circulation_analytics(request):
+    if request.user.user_type != 'admin':
+        return redirect('dashboard')
+    
+    start, end = default_range()
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else start
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else end
+    except ValueError:
+        messages.error(request, 'Invalid date; showing the last 30 days')
+        start, end = default_range()
+    
+    report = circulation_report(start, end, request.GET.get('period', 'week'))
+    return render(request, 'library/analytics.html', {'report': report, 'periods': PERIODS})
+
+
+@login_required
+def book_cache_stats(request):
+    if request.user.user_type != 'admin':
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    return JsonResponse({**cache_stats(), 'fragments': fragment_stats()})
+
+
 @login_required
 def pos_return_book(request):
     if request.user.user_type != 'pos':
@@ -1076,30 +1275,21 @@ def pos_return_book(request):
                 messages.error(request, 'No books selected for return')
                 return redirect('pos_home')
             
-            selected_items = TransactionItem.objects.filter(
-                id__in=book_ids,
-                transaction__student=student,
-                status='borrowed'
-            ).select_related('book', 'transaction')
-            
             return_date = timezone.now()
-            returned_items = []
-            
-            for item in selected_items:
-                item.status = 'returned'
-                item.return_date = return_date
-                item.save()
-                
-                item.book.copies_available += 1
-                item.book.save()
-                returned_items.append(item)
-                
-                transaction = item.transaction
-                all_returned = not transaction.items.filter(status='borrowed').exists()
-                if all_returned:
-                    transaction.status = 'returned'
-                    transaction.return_date = return_date
-                    transaction.save()
+            try:
+                returned_items = return_items(student, book_ids, return_date)
+            except ItemsAlreadyReturned:
+                messages.error(request, 'Some of these books were just returned at another kiosk. Please try again.')
+                borrowed_items = TransactionItem.objects.filter(
+                    transaction__student=student,
+                    status='borrowed',
+                    transaction__approval_status='approved'
+                ).select_related('book', 'transaction')
+                return render(request, 'library/pos_return_book.html', {
+                    'student': student,
+                    'borrowed_items': borrowed_items,
+                    'step': 'select_books'
+                })
             
             still_borrowed_items = TransactionItem.objects.filter(
                 transaction__student=student,
@@ -1136,9 +1326,12 @@ def remove_borrow_book(request):
         if not book_id:
             return JsonResponse({'success': False, 'error': 'No book ID provided'}, status=400)
 
-        books = request.session.get('pos_books', [])
-        books = [b for b in books if str(b['id']) != str(book_id)]
-        request.session['pos_books'] = books
+        try:
+            book_id = int(book_id)
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid book ID'}, status=400)
+
+        PosCart(request).remove([book_id])
         return JsonResponse({'success': True})
 
     return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
@@ -91,6 +91,56 @@ DATABASES = {
 }
 
 
+# ---------------------------
+# CACHES
+# ---------------------------
+# "books" holds the POS ISBN -> book lookup records. Swap the backend for
+# Redis/Memcached to share it between workers; MAX_ENTRIES bounds memory
+# and TIMEOUT is a safety net on top of signal-driven invalidation.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'books': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'library-books',
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    # POS carts (book ids per kiosk session). locmem is fine for a single
+    # server process; with several workers point this at Redis/Memcached,
+    # or set LIBRARY_POS_CART_STORE = 'database' below. While the cache is
+    # unreachable carts fall back to the database store.
+    'pos_carts': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'library-pos-carts',
+    },
+    # Rendered dashboard panels plus the entity version numbers they are
+    # keyed by. Entries never expire (a write bumps the version instead), so
+    # with several workers this must be a shared backend or a worker will
+    # keep serving panels another worker has invalidated.
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'library-fragments',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+LIBRARY_BOOK_CACHE_ALIAS = 'books'
+LIBRARY_POS_CART_CACHE_ALIAS = 'pos_carts'
+LIBRARY_POS_CART_TIMEOUT = 2 * 60 * 60
+# 'cache' (the pos_carts alias) or 'database' (the PosCartRecord table)
+LIBRARY_POS_CART_STORE = os.environ.get('LIBRARY_POS_CART_STORE', 'cache')
+LIBRARY_FRAGMENT_CACHE_ALIAS = 'fragments'
+LIBRARY_VERSION_CACHE_ALIAS = 'fragments'
+
+# In-process title/author autocomplete index: at most this many
+# (word, book) pairs are held per process (~100 bytes each), and the index
+# is rebuilt after MAX_AGE seconds to pick up edits made by other workers.
+LIBRARY_AUTOCOMPLETE_MAX_ENTRIES = 500000
+LIBRARY_AUTOCOMPLETE_MAX_AGE = 300
+
+
 # ---------------------------
 # PASSWORD VALIDATION
 # ---------------------------